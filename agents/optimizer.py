@@ -1,29 +1,133 @@
-from typing import List, Dict, Any
-import random
+import heapq
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from tools.metrics_sim import MetricsSimulator
+
+Scorer = Callable[[List[Dict[str, Any]], Dict[str, Any]], List[float]]
+
+# KPI keywords in brief["goals_kpis"] -> simulated metric they map to
+_KPI_METRICS = {
+    "ctr": r"\bctr\b|click[- ]?through",
+    "clicks": r"\bclicks?\b|traffic|visits|trials?|sign[- ]?ups?|demo",
+    "impressions": r"impressions|reach|awareness|views",
+}
+
+
+def score_ctr(posts: List[Dict[str, Any]], brief: Dict[str, Any]) -> List[float]:
+    return [p["ctr"] for p in posts]
+
+
+def kpi_weights(goals_kpis: str) -> Dict[str, float]:
+    """Weight each metric by how often the brief's goals/KPIs mention it (CTR if none)."""
+    text = (goals_kpis or "").lower()
+    counts = {m: len(re.findall(pattern, text)) for m, pattern in _KPI_METRICS.items()}
+    total = sum(counts.values())
+    if not total:
+        return {"ctr": 1.0}
+    return {m: c / total for m, c in counts.items() if c}
+
+
+def score_kpi(posts: List[Dict[str, Any]], brief: Dict[str, Any]) -> List[float]:
+    """Weighted mix of min-max normalized metrics, weights taken from goals_kpis."""
+    scores = np.zeros(len(posts))
+    for metric, weight in kpi_weights(brief.get("goals_kpis", "")).items():
+        values = np.array([p.get(metric, 0) for p in posts], dtype=float)
+        span = values.max() - values.min() if len(values) else 0
+        if span > 0:
+            scores += weight * (values - values.min()) / span
+    return scores.tolist()
+
+
+def score_ucb(posts: List[Dict[str, Any]], brief: Dict[str, Any], c: float = 1.0) -> List[float]:
+    """Optimistic score: mean CTR plus c standard deviations of the simulated trials."""
+    return [p["ctr"] + c * p.get("ctr_std", 0.0) for p in posts]
+
+
+def make_thompson_scorer(seed: Optional[int] = None) -> Scorer:
+    """One draw per post from Normal(ctr, ctr_std) over its simulated trials."""
+    rng = np.random.default_rng(seed)
+
+    def score_thompson(posts: List[Dict[str, Any]], brief: Dict[str, Any]) -> List[float]:
+        mean = np.array([p["ctr"] for p in posts], dtype=float)
+        std = np.array([p.get("ctr_std", 0.0) for p in posts], dtype=float)
+        return (mean + std * rng.standard_normal(len(posts))).tolist()
+
+    return score_thompson
+
+
+SCORERS: Dict[str, Scorer] = {
+    "ctr": score_ctr,
+    "kpi": score_kpi,
+    "ucb": score_ucb,
+}
 
 
 class OptimizerAgent:
     """
     Designs simple experiments and ranks posts by simulated performance,
     ensuring they respect goals, KPIs, and constraints.
+
+    Metrics already attached upstream (MetricsSimulator) are reused; only
+    posts without a "ctr" are simulated here. scoring is "ctr", "kpi",
+    "ucb", "thompson" or a callable(posts, brief) -> scores. With top_k set,
+    only the best top_k posts per channel are kept (heap selection instead
+    of a full sort).
     """
 
+    def __init__(
+        self,
+        scoring: Union[str, Scorer] = "ctr",
+        top_k: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        if callable(scoring):
+            self.scorer = scoring
+        elif scoring == "thompson":
+            self.scorer = make_thompson_scorer(seed)
+        elif scoring in SCORERS:
+            self.scorer = SCORERS[scoring]
+        else:
+            raise ValueError(f"Unknown scoring '{scoring}'; expected one of {sorted(SCORERS) + ['thompson']}")
+        self.top_k = top_k
+        self.seed = seed
+
+    def _with_metrics(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        missing = [i for i, p in enumerate(posts) if "ctr" not in p]
+        if not missing:
+            return posts
+        simulated = MetricsSimulator(seed=self.seed).simulate([posts[i] for i in missing])
+        posts = list(posts)
+        for i, p in zip(missing, simulated):
+            posts[i] = p
+        return posts
+
+    def rank(self, posts: List[Dict[str, Any]], brief: Dict[str, Any]) -> List[Dict[str, Any]]:
+        posts = self._with_metrics(posts)
+        scores = self.scorer(posts, brief)
+
+        if self.top_k is None:
+            order = sorted(range(len(posts)), key=scores.__getitem__, reverse=True)
+            return [posts[i] for i in order]
+
+        by_channel: Dict[str, List[int]] = {}
+        for i, p in enumerate(posts):
+            by_channel.setdefault(str(p.get("channel", "")).strip().lower(), []).append(i)
+        keep = []
+        for indices in by_channel.values():
+            keep.extend(heapq.nlargest(self.top_k, indices, key=scores.__getitem__))
+        keep.sort(key=scores.__getitem__, reverse=True)
+        return [posts[i] for i in keep]
+
     def optimize(
         self,
         posts: List[Dict[str, Any]],
         brief: Dict[str, Any],
         strategy: Dict[str, Any],
     ) -> (List[Dict[str, Any]], List[Dict[str, Any]]):
-        # Simulate metrics (quick heuristic)
-        scored = []
-        for p in posts:
-            clicks = random.randint(20, 300)
-            impressions = random.randint(500, 5000)
-            ctr = round(100 * clicks / impressions, 2)
-            scored.append({**p, "clicks": clicks, "impressions": impressions, "ctr": ctr})
-
-        # Sort by CTR
-        sorted_posts = sorted(scored, key=lambda x: x["ctr"], reverse=True)
+        sorted_posts = self.rank(posts, brief)
 
         # Design simple experiments based on KPIs and channels
         experiments = [
@@ -1,45 +1,168 @@
-from typing import Dict, Any
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
 
+from tools.prompt_builder import PromptBuilder
 
-class PlannerAgent:
-    def __init__(self, llm):
-        self.llm = llm
-
-    def plan_strategy_and_campaign(self, brief: Dict[str, Any]) -> Dict[str, Any]:
-        weeks = brief.get("timeline_weeks", 6)
-
-        prompt = f"""
-You are CMP, the world's best content marketing planner.
-
-BRIEF (JSON):
-{brief}
+# Everything but timeline_weeks: only the week-by-week execution plan depends
+# on the timeline, so changing it doesn't need a new core strategy
+BRIEF_FIELDS = (
+    "topic",
+    "product",
+    "target_audience",
+    "goals_kpis",
+    "budget",
+    "preferred_channels",
+    "constraints",
+    "additional_notes",
+)
 
+_TASK = """
 TASK:
-Create a FULL strategy object with EXACTLY these top-level keys:
+Create a FULL strategy object with EXACTLY these top-level keys, in this order:
 - "strategy_overview"
 - "target_audience"
+- "messaging_positioning"
 - "market_analysis"
+- "trend_adaptation"
 - "customer_journey"
 - "objectives_kpis"
-- "messaging_positioning"
 - "channel_strategy"
 - "budget_plan"
-- "trend_adaptation"
 - "analytics_feedback"
-- "execution_plan"
 
 Requirements:
 - "strategy_overview": summary, key_messages, channels.
-- "execution_plan": a LIST of weeks. Each week is an OBJECT with:
+
+Return ONLY a single VALID JSON object with those keys.
+No explanations, no extra fields.
+"""
+
+_WEEKS_TASK = """
+TASK:
+Write the execution plan for weeks {first} to {last} of a {total}-week campaign for this brief.
+Pace it across the whole campaign: week 1 launches it and week {total} closes it
+(final push, wrap-up and review), so weeks {first} to {last} should fit where they fall.
+
+Return ONLY a single VALID JSON object with key:
+- "execution_plan": a LIST with one OBJECT per week ({first} to {last}), each with:
   - week_number
   - theme
   - main_objective
   - key_message
   - channels (list of strings)
   - campaign_ideas (list of strings)
-
-Return ONLY a single VALID JSON object with those keys.
-No explanations, no extra fields.
+Do not include any other keys, comments, or text.
 """
-        strategy = self.llm(prompt)
-        return strategy
+
+
+class PlannerAgent:
+    """
+    Builds the strategy from one call for the core strategy sections plus
+    one call per block of weeks for the execution_plan, all running
+    concurrently, with the weeks merged in order. Each call stays well under
+    the completion token cap however long the timeline is, and latency grows
+    with the block size rather than with timeline_weeks.
+
+    Each block's prompt gives the total timeline, so a block can pace its
+    weeks toward the campaign's end. The core sections
+    the researcher and writer read are asked for early, so when the output
+    is streamed those agents can start while the rest is still generating.
+    """
+
+    # Max prompt tokens sent to the model; the brief is trimmed to fit
+    input_budget = 900
+    weeks_per_call = 4
+    default_weeks = 6
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def build_prompt(self, brief: Dict[str, Any]) -> str:
+        return (
+            PromptBuilder(self.input_budget)
+            .text("You are CMP, the world's best content marketing planner.")
+            .add("BRIEF (JSON)", {k: brief.get(k) for k in BRIEF_FIELDS}, priority=1)
+            .text(_TASK.strip())
+            .build()
+        )
+
+    def build_weeks_prompt(self, brief: Dict[str, Any], first: int, last: int) -> str:
+        return (
+            PromptBuilder(self.input_budget)
+            .text("You are CMP's week-by-week campaign scheduler.")
+            .add("BRIEF (JSON)", {k: brief.get(k) for k in BRIEF_FIELDS}, priority=1)
+            .text(_WEEKS_TASK.format(first=first, last=last, total=self.total_weeks(brief)).strip())
+            .build()
+        )
+
+    def total_weeks(self, brief: Dict[str, Any]) -> int:
+        try:
+            weeks = int(brief.get("timeline_weeks") or self.default_weeks)
+        except (TypeError, ValueError):
+            weeks = self.default_weeks
+        return max(weeks, 1)
+
+    def week_blocks(self, brief: Dict[str, Any]) -> List[Tuple[int, int]]:
+        """(first, last) week numbers of each execution-plan call, in order."""
+        weeks = self.total_weeks(brief)
+        return [
+            (first, min(first + self.weeks_per_call - 1, weeks))
+            for first in range(1, weeks + 1, self.weeks_per_call)
+        ]
+
+    def merge_weeks(self, blocks: List[Tuple[int, int]], batches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Concatenate the blocks' weeks in week order. Weeks a block returned
+        outside its range are dropped; weeks without a usable week_number
+        are numbered by their position in the block.
+        """
+        plan = {}
+        for (first, last), batch in zip(blocks, batches):
+            weeks = batch.get("execution_plan", []) if isinstance(batch, dict) else []
+            for offset, week in enumerate(weeks if isinstance(weeks, list) else []):
+                if not isinstance(week, dict):
+                    continue
+                try:
+                    number = int(week.get("week_number"))
+                except (TypeError, ValueError):
+                    number = first + offset
+                if first <= number <= last and number not in plan:
+                    plan[number] = {**week, "week_number": number}
+        return [plan[n] for n in sorted(plan)]
+
+    def plan_core_strategy(self, brief: Dict[str, Any]) -> Dict[str, Any]:
+        return self.llm(self.build_prompt(brief))
+
+    async def plan_core_strategy_async(self, brief: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.llm(self.build_prompt(brief))
+
+    def plan_execution(self, brief: Dict[str, Any]) -> List[Dict[str, Any]]:
+        blocks = self.week_blocks(brief)
+        # Each worker runs in a copy of our context so tracing spans nest under this stage
+        contexts = [contextvars.copy_context() for _ in blocks]
+        with ThreadPoolExecutor(max_workers=len(blocks)) as pool:
+            batches = list(
+                pool.map(
+                    lambda ctx, b: ctx.run(self.llm, self.build_weeks_prompt(brief, *b)),
+                    contexts,
+                    blocks,
+                )
+            )
+        return self.merge_weeks(blocks, batches)
+
+    async def plan_execution_async(self, brief: Dict[str, Any]) -> List[Dict[str, Any]]:
+        blocks = self.week_blocks(brief)
+        batches = await asyncio.gather(*(self.llm(self.build_weeks_prompt(brief, *b)) for b in blocks))
+        return self.merge_weeks(blocks, list(batches))
+
+    def plan_strategy_and_campaign(self, brief: Dict[str, Any]) -> Dict[str, Any]:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            weeks = pool.submit(contextvars.copy_context().run, self.plan_execution, brief)
+            strategy = self.plan_core_strategy(brief)
+            return {**strategy, "execution_plan": weeks.result()}
+
+    async def plan_strategy_and_campaign_async(self, brief: Dict[str, Any]) -> Dict[str, Any]:
+        strategy, weeks = await asyncio.gather(self.plan_core_strategy_async(brief), self.plan_execution_async(brief))
+        return {**strategy, "execution_plan": weeks}
@@ -1,54 +1,90 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from tools.prompt_builder import PromptBuilder
 from tools.tavily_search import TavilySearchTool
 
+# The only brief fields and planner sections the validator needs
+BRIEF_FIELDS = ("topic", "product", "target_audience")
+STRATEGY_FIELDS = ("market_analysis", "trend_adaptation")
+
+_TASK = """
+TASK:
+1) Refine and deepen ONLY "market_analysis" and "trend_adaptation" using the snippets.
+2) Add "validation_notes" as a list of short bullet-point strings describing
+   risks, contradictions, or uncertainties (focus on market & trends).
+
+Return ONLY a single VALID JSON object with EXACT keys:
+["market_analysis","trend_adaptation","validation_notes"].
+Do not include any other keys, text, or comments.
+"""
+
 
 class ResearcherAgent:
     """
     Uses web search to validate and deepen market_analysis and trend_adaptation.
     Adds validation_notes to make CMP transparent about confidence.
+
+    The search query depends only on the brief, so callers may run the search
+    up front (or concurrently with the planner) and pass the snippets in.
     """
 
+    input_budget = 1500
+
     def __init__(self, llm, search_tool: TavilySearchTool):
         self.llm = llm
         self.search_tool = search_tool
 
-    def enrich_and_validate_strategy(
-        self, brief: Dict[str, Any], strategy: Dict[str, Any]
-    ) -> Dict[str, Any]:
+    def build_query(self, brief: Dict[str, Any]) -> str:
         topic = brief.get("topic")
-        snippets = self.search_tool.search(
-            f"{topic} latest industry trends, competitors, positioning, audience"
-        )
-
-        prompt = f"""
-You are a marketing research validator.
+        return f"{topic} latest industry trends, competitors, positioning, audience"
 
-BRIEF:
-{brief}
-
-CURRENT_STRATEGY:
-market_analysis: {strategy.get('market_analysis')}
-trend_adaptation: {strategy.get('trend_adaptation')}
-
-WEB_SNIPPETS:
-{snippets}
+    def build_prompt(
+        self, brief: Dict[str, Any], strategy: Dict[str, Any], snippets: str
+    ) -> str:
+        # Snippets are the bulkiest and least essential input, so they are trimmed first
+        return (
+            PromptBuilder(self.input_budget)
+            .text("You are a marketing research validator.")
+            .add("BRIEF", {k: brief.get(k) for k in BRIEF_FIELDS}, priority=2)
+            .add(
+                "CURRENT_STRATEGY",
+                {
+                    "market_analysis": strategy.get("market_analysis"),
+                    "trend_adaptation": strategy.get("trend_adaptation"),
+                },
+                priority=1,
+            )
+            .add("WEB_SNIPPETS", snippets, priority=0)
+            .text(_TASK.strip())
+            .build()
+        )
 
-TASK:
-1) Refine and deepen ONLY "market_analysis" and "trend_adaptation" using the snippets.
-2) Add "validation_notes" as a list of short bullet-point strings describing
-   risks, contradictions, or uncertainties (focus on market & trends).
+    def merge(self, strategy: Dict[str, Any], updated: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of strategy with the validated research fields applied."""
+        return {
+            **strategy,
+            "market_analysis": updated.get("market_analysis", strategy.get("market_analysis")),
+            "trend_adaptation": updated.get("trend_adaptation", strategy.get("trend_adaptation")),
+            "validation_notes": updated.get("validation_notes", []),
+        }
 
-Return ONLY a single VALID JSON object with EXACT keys:
-["market_analysis","trend_adaptation","validation_notes"].
-Do not include any other keys, text, or comments.
-"""
-        updated = self.llm(prompt)
+    def enrich_and_validate_strategy(
+        self,
+        brief: Dict[str, Any],
+        strategy: Dict[str, Any],
+        snippets: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if snippets is None:
+            snippets = self.search_tool.search(self.build_query(brief))
+        updated = self.llm(self.build_prompt(brief, strategy, snippets))
+        return self.merge(strategy, updated)
 
-        strategy["market_analysis"] = updated.get(
-            "market_analysis", strategy.get("market_analysis")
-        )
-        strategy["trend_adaptation"] = updated.get(
-            "trend_adaptation", strategy.get("trend_adaptation")
-        )
-        strategy["validation_notes"] = updated.get("validation_notes", [])
-        return strategy
+    async def enrich_and_validate_strategy_async(
+        self,
+        brief: Dict[str, Any],
+        strategy: Dict[str, Any],
+        snippets: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if snippets is None:
+            snippets = await self.search_tool.search(self.build_query(brief))
+        updated = await self.llm(self.build_prompt(brief, strategy, snippets))
+        return self.merge(strategy, updated)
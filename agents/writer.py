@@ -1,48 +1,32 @@
-from typing import Dict, Any
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
 
+from tools.prompt_builder import PromptBuilder
 
-class WriterAgent:
-    """
-    Turns execution plan + messaging into concrete campaigns and posts.
-    (Single-pass version to keep JSON stable.)
-    """
-
-    def __init__(self, llm):
-        self.llm = llm
-
-    def draft_and_review_assets(self, brief: Dict[str, Any], strategy: Dict[str, Any]) -> Dict[str, Any]:
-        execution_plan = strategy.get("execution_plan")
-        messaging = strategy.get("messaging_positioning")
-        goals_kpis = brief.get("goals_kpis", "")
-        target_audience = brief.get("target_audience", "")
-        preferred_channels = brief.get("preferred_channels", "")
-
-        prompt = f"""
-You are a senior campaign designer and copywriter.
-
-BRIEF:
-{brief}
-
-MESSAGING_POSITIONING:
-{messaging}
-
-EXECUTION_PLAN:
-{execution_plan}
-
-CONTEXT:
-- Target audience: {target_audience}
-- Goals & KPIs: {goals_kpis}
-- Preferred channels: {preferred_channels}
+# Brief fields the campaign designer needs; the rest never reach the writer
+BRIEF_FIELDS = ("topic", "product", "target_audience", "goals_kpis", "preferred_channels", "constraints")
+# Planner sections it reads; the execution plan comes from its own stage
+STRATEGY_FIELDS = ("messaging_positioning",)
 
+_OUTLINE_TASK = """
 TASK:
-1) For this strategy, create 5–7 high-level campaigns. For each campaign, provide:
+For this strategy, create 5–7 high-level campaigns. For each campaign, provide:
    - campaign_name
    - goal
    - key_message
    - main_channel
    - suggested_creative_idea
 
-2) For each campaign, write 2 example posts with:
+Return ONLY a single VALID JSON object with key:
+- "campaigns": list of campaign objects
+Do not include any other keys, comments, or text.
+"""
+
+_POSTS_TASK = """
+TASK:
+Write 2 example posts for this campaign with:
    - campaign_name
    - channel
    - copy (<= 120 words)
@@ -52,10 +36,94 @@ All copy must:
 - Align with the brief goals and audience.
 - Use clear, non-clickbait language.
 
-Return ONLY a single VALID JSON object with keys:
-- "campaigns": list of campaign objects
+Return ONLY a single VALID JSON object with key:
 - "posts": list of post objects
 Do not include any other keys, comments, or text.
 """
-        assets = self.llm(prompt)
-        return assets
+
+
+class WriterAgent:
+    """
+    Turns execution plan + messaging into concrete campaigns and posts.
+
+    Two phases: one short call for campaign outlines, then one post-writing
+    call per campaign, all running concurrently, so generation time scales
+    with the longest campaign rather than the sum of them.
+    """
+
+    # Max prompt tokens per call; execution plan and messaging are trimmed to fit
+    outline_budget = 1500
+    posts_budget = 700
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def build_outline_prompt(self, brief: Dict[str, Any], strategy: Dict[str, Any]) -> str:
+        return (
+            PromptBuilder(self.outline_budget)
+            .text("You are a senior campaign designer.")
+            .add("BRIEF", {k: brief.get(k) for k in BRIEF_FIELDS}, priority=2)
+            .add("MESSAGING_POSITIONING", strategy.get("messaging_positioning"), priority=1)
+            .add("EXECUTION_PLAN", strategy.get("execution_plan"), priority=0)
+            .text(_OUTLINE_TASK.strip())
+            .build()
+        )
+
+    def build_posts_prompt(
+        self, brief: Dict[str, Any], strategy: Dict[str, Any], campaign: Dict[str, Any]
+    ) -> str:
+        return (
+            PromptBuilder(self.posts_budget)
+            .text("You are a senior copywriter.")
+            .add("CAMPAIGN", campaign, fixed=True)
+            .add(
+                "CONTEXT",
+                {
+                    "target_audience": brief.get("target_audience"),
+                    "goals_kpis": brief.get("goals_kpis"),
+                    "constraints": brief.get("constraints"),
+                },
+                priority=1,
+            )
+            .add("MESSAGING_POSITIONING", strategy.get("messaging_positioning"), priority=0)
+            .text(_POSTS_TASK.strip())
+            .build()
+        )
+
+    def merge(self, outline: Dict[str, Any], post_batches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine the outline and per-campaign posts into {"campaigns", "posts"}."""
+        campaigns = outline.get("campaigns", [])
+        posts = []
+        for campaign, batch in zip(campaigns, post_batches):
+            for post in batch.get("posts", []):
+                if isinstance(post, dict) and not post.get("campaign_name"):
+                    post["campaign_name"] = campaign.get("campaign_name")
+                posts.append(post)
+        return {"campaigns": campaigns, "posts": posts}
+
+    def draft_and_review_assets(self, brief: Dict[str, Any], strategy: Dict[str, Any]) -> Dict[str, Any]:
+        outline = self.llm(self.build_outline_prompt(brief, strategy))
+        campaigns = outline.get("campaigns", [])
+        if not campaigns:
+            return self.merge(outline, [])
+
+        # Each worker runs in a copy of our context so tracing spans nest under this stage
+        contexts = [contextvars.copy_context() for _ in campaigns]
+        with ThreadPoolExecutor(max_workers=len(campaigns)) as pool:
+            batches = list(
+                pool.map(
+                    lambda ctx, c: ctx.run(self.llm, self.build_posts_prompt(brief, strategy, c)),
+                    contexts,
+                    campaigns,
+                )
+            )
+        return self.merge(outline, batches)
+
+    async def draft_and_review_assets_async(
+        self, brief: Dict[str, Any], strategy: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        outline = await self.llm(self.build_outline_prompt(brief, strategy))
+        batches = await asyncio.gather(
+            *(self.llm(self.build_posts_prompt(brief, strategy, c)) for c in outline.get("campaigns", []))
+        )
+        return self.merge(outline, list(batches))
@@ -0,0 +1,198 @@
+"""
+Batch mode: run many briefs from a JSONL file.
+
+    python batch.py briefs.jsonl results.jsonl --concurrency 8
+
+Each input line is a brief (optionally with an "id"). Each output line is
+{"id", "brief_hash", "result"} or {"id", "brief_hash", "error"}, written as
+soon as that brief finishes. A line that isn't a JSON object gets an
+{"id": "line-N", "error"} row and the other briefs carry on. Re-running
+with the same output file skips briefs that already have a result and
+retries the ones that errored.
+"""
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+from main import make_async_llm, run_campaign_async
+from pipeline import brief_hash
+from tools import AsyncTavilySearchTool
+
+
+def brief_id(brief: Dict[str, Any]) -> str:
+    return str(brief.get("id") or brief_hash(brief)[:16])
+
+
+class InvalidBrief:
+    """An input line that couldn't be read as a brief; recorded as an error row."""
+
+    __slots__ = ("id", "error")
+
+    def __init__(self, id: str, error: str):
+        self.id = id
+        self.error = error
+
+
+def read_briefs(path: str) -> Iterator[Union[Dict[str, Any], InvalidBrief]]:
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                brief = json.loads(line)
+            except ValueError as e:
+                yield InvalidBrief(f"line-{n}", f"{type(e).__name__}: {e}")
+                continue
+            if not isinstance(brief, dict):
+                yield InvalidBrief(f"line-{n}", f"Expected a JSON object, got {type(brief).__name__}")
+                continue
+            yield brief
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids that already have a successful result in output_path."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # torn write from an interrupted run
+            if "result" in row:
+                done.add(row["id"])
+    return done
+
+
+def limit_concurrency(llm, search_tool, max_in_flight: int):
+    """
+    Wrap a shared async llm and search tool so that at most max_in_flight
+    LLM/search calls are outstanding across all briefs.
+    """
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be >= 1, got {max_in_flight}")
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def limited_llm(prompt: str, **kwargs):
+        async with semaphore:
+            return await llm(prompt, **kwargs)
+
+    class LimitedSearch:
+        async def search(self, query: str) -> str:
+            async with semaphore:
+                return await search_tool.search(query)
+
+    limited_llm.cache = getattr(llm, "cache", None)
+    return limited_llm, LimitedSearch()
+
+
+async def run_batch_async(
+    briefs: Iterable[Dict[str, Any]],
+    output_path: str,
+    concurrency: int = 8,
+    llm=None,
+    search_tool=None,
+    resume: bool = True,
+) -> Dict[str, int]:
+    """
+    Run every brief through run_campaign_async, sharing one LLM client and one
+    search client, and append each result to output_path as it completes.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+    llm, search_tool = limit_concurrency(
+        llm or make_async_llm(), search_tool or AsyncTavilySearchTool(), concurrency
+    )
+    skip = completed_ids(output_path) if resume else set()
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+
+    pending = enumerate(briefs, 1)
+    summary = {"ok": 0, "failed": 0, "skipped": 0}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        def write(row: Dict[str, Any]) -> None:
+            out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+        async def worker():
+            # Workers pull briefs lazily so huge inputs never sit in memory as tasks
+            for n, brief in pending:
+                if isinstance(brief, InvalidBrief):
+                    write({"id": brief.id, "error": brief.error})
+                    summary["failed"] += 1
+                    continue
+                try:
+                    row = {"id": brief_id(brief), "brief_hash": brief_hash(brief)}
+                except Exception as e:
+                    # One bad item must not take the rest of the batch down with it
+                    write({"id": f"item-{n}", "error": f"{type(e).__name__}: {e}"})
+                    summary["failed"] += 1
+                    continue
+                if row["id"] in skip:
+                    summary["skipped"] += 1
+                    continue
+                try:
+                    row["result"] = await run_campaign_async(brief, llm=llm, search_tool=search_tool)
+                    summary["ok"] += 1
+                except Exception as e:
+                    row["error"] = f"{type(e).__name__}: {e}"
+                    summary["failed"] += 1
+                write(row)
+
+        # More briefs than call slots keeps the slots busy while briefs wait on each other
+        await asyncio.gather(*(worker() for _ in range(concurrency * 2)))
+
+    return summary
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    resume: bool = True,
+    llm=None,
+    search_tool=None,
+) -> Dict[str, int]:
+    return asyncio.run(
+        run_batch_async(
+            read_briefs(input_path),
+            output_path,
+            concurrency=concurrency,
+            llm=llm,
+            search_tool=search_tool,
+            resume=resume,
+        )
+    )
+
+
+def _positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return n
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Run CMP on a JSONL file of briefs.")
+    parser.add_argument("input", help="JSONL file with one brief per line")
+    parser.add_argument("output", help="JSONL file to append results to")
+    parser.add_argument(
+        "--concurrency", type=_positive_int, default=8, help="max in-flight LLM/search calls (default 8)"
+    )
+    parser.add_argument(
+        "--no-resume", action="store_true", help="start over instead of skipping finished briefs"
+    )
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.input, args.output, concurrency=args.concurrency, resume=not args.no_resume)
+    print(f"ok={summary['ok']} failed={summary['failed']} skipped={summary['skipped']}")
+
+
+if __name__ == "__main__":
+    main()
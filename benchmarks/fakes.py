@@ -0,0 +1,171 @@
+"""
+Local stand-ins for make_llm() / make_async_llm() and the Tavily search tools,
+with configurable latency so the pipeline can be benchmarked offline.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from main import extract_json
+from pipeline import field_sink
+
+STRATEGY = {
+    "strategy_overview": {
+        "summary": "Position the product as the fastest way for small teams to automate busywork.",
+        "key_messages": ["Save 5 hours a week", "No code required", "Set up in an afternoon"],
+        "channels": ["LinkedIn", "email", "blog"],
+    },
+    "target_audience": {"description": "Owners of small service businesses", "pain_points": ["admin overload"]},
+    "market_analysis": {"market_size": "Growing", "market_trends": ["AI copilots", "no-code"]},
+    "customer_journey": {"awareness": {"description": "Discover via LinkedIn"}},
+    "objectives_kpis": {"objectives": "Grow trials", "kpis": ["trials", "CTR"]},
+    "messaging_positioning": {"messaging": "Automation without the IT team", "key_messages": ["Simple", "Fast"]},
+    "channel_strategy": {"channels": ["LinkedIn", "email", "blog"]},
+    "budget_plan": {"budget": "Low", "allocation": [{"channel": "LinkedIn", "allocation": "60%"}]},
+    "trend_adaptation": {"strategy": "Short demo videos"},
+    "analytics_feedback": {"kpis": ["CTR", "trials"]},
+    "execution_plan": [
+        {"week_number": w, "theme": f"Theme {w}", "channels": ["LinkedIn", "email"], "campaign_ideas": ["Demo"]}
+        for w in range(1, 7)
+    ],
+}
+
+RESEARCH = {
+    "market_analysis": {"market_size": "Validated: growing", "market_trends": ["AI copilots"]},
+    "trend_adaptation": {"strategy": "Short demo videos, validated"},
+    "validation_notes": ["Market size figures vary across sources"],
+}
+
+CAMPAIGNS = {
+    "campaigns": [
+        {
+            "campaign_name": f"Campaign {i}",
+            "goal": "Trials",
+            "key_message": "Automation without the IT team",
+            "main_channel": ["LinkedIn", "email", "blog"][i % 3],
+            "suggested_creative_idea": "Before/after workflow video",
+        }
+        for i in range(6)
+    ]
+}
+
+
+def posts_for(prompt: str) -> Dict[str, Any]:
+    name = "Campaign"
+    marker = '"campaign_name":"'
+    if marker in prompt:
+        name = prompt.split(marker, 1)[1].split('"', 1)[0]
+    return {
+        "posts": [
+            {"campaign_name": name, "channel": channel, "copy": f"{name}: save hours every week. " * 6, "cta": "Start a free trial"}
+            for channel in ("LinkedIn", "email")
+        ]
+    }
+
+
+def canned_text(prompt: str) -> str:
+    """Raw model text for a prompt, wrapped in the prose models tend to add."""
+    if "marketing research validator" in prompt:
+        payload = RESEARCH
+    elif "campaign designer" in prompt:
+        payload = CAMPAIGNS
+    elif "senior copywriter" in prompt:
+        payload = posts_for(prompt)
+    elif "campaign scheduler" in prompt:
+        # only the weeks the block asks for, as a model would write them
+        first, last = (int(w) for w in prompt.split("for weeks ", 1)[1].split(" of", 1)[0].split(" to "))
+        payload = {"execution_plan": [w for w in STRATEGY["execution_plan"] if first <= w["week_number"] <= last]}
+    elif '"execution_plan"' in prompt:
+        payload = STRATEGY
+    else:
+        # the core strategy prompt leaves the weeks to the scheduler calls
+        payload = {k: v for k, v in STRATEGY.items() if k != "execution_plan"}
+    return "Here is the JSON you asked for:\n" + json.dumps(payload, indent=2) + "\nLet me know if you need changes."
+
+
+class LatencyModel:
+    """
+    Lognormal latency: median_ms * exp(sigma * N(0, 1)), plus per_token_ms for
+    every output token (approximated as 4 characters), scaled by `scale`.
+    """
+
+    def __init__(
+        self,
+        median_ms: float = 40.0,
+        sigma: float = 0.3,
+        per_token_ms: float = 0.0,
+        scale: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.per_token_ms = per_token_ms
+        self.scale = scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, output_chars: int = 0) -> float:
+        with self._lock:
+            jitter = self._rng.gauss(0.0, self.sigma)
+        ms = self.median_ms * pow(2.718281828, jitter) + self.per_token_ms * output_chars / 4
+        return ms * self.scale / 1000
+
+
+class FakeLLM:
+    """Sync call_llm replacement: sleeps per the latency model, then parses canned text."""
+
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel()
+        self.calls = 0
+
+    def __call__(self, prompt: str, **kwargs):
+        self.calls += 1
+        text = canned_text(prompt)
+        time.sleep(self.latency.sample(len(text)))
+        return extract_json(text)
+
+
+class AsyncFakeLLM(FakeLLM):
+    """
+    Streams like make_async_llm(): the sampled latency is spread over the
+    top-level fields by size, and each is passed to on_field (or the
+    pipeline stage's field sink) as it "arrives".
+    """
+
+    async def __call__(self, prompt: str, on_field=None, **kwargs):
+        self.calls += 1
+        text = canned_text(prompt)
+        total = self.latency.sample(len(text))
+        result = extract_json(text)
+        on_field = on_field or field_sink()
+        if on_field is None:
+            await asyncio.sleep(total)
+            return result
+        size = len(json.dumps(result))
+        for key, value in result.items():
+            await asyncio.sleep(total * len(json.dumps(value)) / size)
+            on_field(key, value)
+        return result
+
+
+SNIPPETS = "\n".join(
+    f"- Source {i} (https://example.com/{i}): AI tools are spreading quickly among small businesses." for i in range(5)
+)
+
+
+class FakeSearchTool:
+    def __init__(self, latency: Optional[LatencyModel] = None):
+        self.latency = latency or LatencyModel(median_ms=20.0)
+
+    def search(self, query: str) -> str:
+        time.sleep(self.latency.sample())
+        return SNIPPETS
+
+
+class AsyncFakeSearchTool(FakeSearchTool):
+    async def search(self, query: str) -> str:
+        await asyncio.sleep(self.latency.sample())
+        return SNIPPETS
@@ -0,0 +1,205 @@
+"""
+Offline performance benchmarks for the CMP pipeline.
+
+    python -m benchmarks.run                  # run and compare to baseline.json
+    python -m benchmarks.run --update-baseline
+    python -m benchmarks.run --quick          # smoke run, no baseline gate
+
+The LLM and search tool are replaced by the fakes in benchmarks/fakes.py, so
+results depend only on this code and the configured latency model. Metrics
+ending in _ms are lower-is-better, metrics ending in _per_s higher-is-better.
+Exits with status 1 if any metric regresses past the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from batch import run_batch_async
+from benchmarks.fakes import (
+    AsyncFakeLLM,
+    AsyncFakeSearchTool,
+    FakeLLM,
+    FakeSearchTool,
+    LatencyModel,
+    STRATEGY,
+)
+from main import extract_json, run_campaign, run_campaign_async
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BRIEF = {
+    "topic": "AI tools for small businesses",
+    "product": "AI automation SaaS for SMEs",
+    "target_audience": "Owners of small service businesses in US/Europe",
+    "goals_kpis": "Increase trials by 30% in 3 months; KPIs: trials, demo bookings, CTR",
+    "budget": "Low to medium budget",
+    "preferred_channels": "LinkedIn, email, blog",
+    "timeline_weeks": 6,
+    "constraints": "No misleading claims",
+    "additional_notes": "",
+}
+
+
+def _p50(samples):
+    return round(statistics.median(samples), 2)
+
+
+def _time_ms(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_single_sync(repeats: int, latency: LatencyModel) -> Dict[str, float]:
+    totals, stages = [], {}
+    for _ in range(repeats):
+        llm, search = FakeLLM(latency), FakeSearchTool(latency)
+        start = time.perf_counter()
+        result = run_campaign(BRIEF, llm=llm, search_tool=search)
+        totals.append((time.perf_counter() - start) * 1000)
+        for span in result["trace"]["spans"]:
+            if span["kind"] == "stage":
+                stages.setdefault(span["name"], []).append(span["duration_ms"])
+    metrics = {"single_sync_ms": _p50(totals)}
+    metrics.update({f"stage_{name}_ms": _p50(v) for name, v in stages.items()})
+    return metrics
+
+
+def bench_single_async(repeats: int, latency: LatencyModel) -> Dict[str, float]:
+    totals = [
+        _time_ms(lambda: asyncio.run(
+            run_campaign_async(BRIEF, llm=AsyncFakeLLM(latency), search_tool=AsyncFakeSearchTool(latency))
+        ))
+        for _ in range(repeats)
+    ]
+    return {"single_async_ms": _p50(totals)}
+
+
+def bench_concurrent(runs: int, latency: LatencyModel) -> Dict[str, float]:
+    llm, search = AsyncFakeLLM(latency), AsyncFakeSearchTool(latency)
+
+    async def many():
+        await asyncio.gather(*(run_campaign_async(BRIEF, llm=llm, search_tool=search) for _ in range(runs)))
+
+    elapsed = _time_ms(lambda: asyncio.run(many()))
+    return {"concurrent_total_ms": round(elapsed, 2), "concurrent_runs_per_s": round(runs / (elapsed / 1000), 2)}
+
+
+def bench_batch(briefs: int, concurrency: int, latency: LatencyModel) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "results.jsonl")
+        items = [{**BRIEF, "id": f"b{i}"} for i in range(briefs)]
+        elapsed = _time_ms(lambda: asyncio.run(run_batch_async(
+            items, out, concurrency=concurrency,
+            llm=AsyncFakeLLM(latency), search_tool=AsyncFakeSearchTool(latency), resume=False,
+        )))
+    return {"batch_briefs_per_s": round(briefs / (elapsed / 1000), 2)}
+
+
+def bench_extract_json(repeats: int) -> Dict[str, float]:
+    big = {**STRATEGY, "execution_plan": STRATEGY["execution_plan"] * 400}
+    # Prose around the object forces the incremental-parser path
+    large = "Sure! Here is the plan:\n" + json.dumps(big, indent=2) + "\nHope this helps."
+    truncated = large[: len(large) // 2]
+
+    # CPU-bound: best-of-N is far less noisy than the median
+    extract_json(large)  # warm-up
+    samples = [_time_ms(lambda: extract_json(large)) for _ in range(repeats)]
+    mb = len(large.encode("utf-8")) / 1e6
+
+    def malformed():
+        try:
+            extract_json(truncated)
+        except ValueError:
+            pass
+
+    bad = [_time_ms(malformed) for _ in range(repeats)]
+    return {
+        "extract_json_large_mb_per_s": round(mb / (min(samples) / 1000), 2),
+        "extract_json_malformed_ms": round(min(bad), 2),
+    }
+
+
+def run_suite(quick: bool = False, latency: LatencyModel | None = None) -> Dict[str, float]:
+    # per_token_ms models decode time, so streamed fields arrive before a call ends
+    latency = latency or LatencyModel(median_ms=40.0, sigma=0.3, per_token_ms=0.1, seed=42)
+    repeats = 2 if quick else 5
+    metrics: Dict[str, float] = {}
+    metrics.update(bench_single_sync(repeats, latency))
+    metrics.update(bench_single_async(repeats, latency))
+    metrics.update(bench_concurrent(4 if quick else 20, latency))
+    metrics.update(bench_batch(8 if quick else 40, 8, latency))
+    metrics.update(bench_extract_json(10))
+    return metrics
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], tolerance: float, noise_floor_ms: float = 1.0):
+    """
+    Return (rows, regressions); each row is (name, baseline, current, change).
+    A latency metric only regresses if it is also noise_floor_ms slower, so
+    sub-millisecond stages don't flap.
+    """
+    rows, regressions = [], []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if not base:
+            rows.append((name, None, value, None))
+            continue
+        change = (value - base) / base
+        rows.append((name, base, value, change))
+        if name.endswith("_ms"):
+            worse = change > tolerance and value - base > noise_floor_ms
+        else:
+            worse = change < -tolerance
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline CMP performance benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads; report only, no baseline check")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    parser.add_argument("--noise-floor-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args(argv)
+
+    metrics = run_suite(quick=args.quick)
+
+    if args.quick:
+        for name, value in metrics.items():
+            print(f"{name:34} {value:12.2f}")
+        return 0
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"metrics": metrics}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("metrics", {})
+
+    rows, regressions = compare(metrics, baseline, args.tolerance, args.noise_floor_ms)
+    print(f"{'metric':34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base, value, change in rows:
+        base_s = f"{base:12.2f}" if base is not None else f"{'-':>12}"
+        change_s = f"{change:+8.1%}" if change is not None else f"{'new':>8}"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:34} {base_s} {value:12.2f} {change_s}{flag}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
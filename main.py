@@ -1,23 +1,40 @@
 import os
 import json
+import time
+import queue
+import asyncio
+import threading
+from contextlib import contextmanager
 from datetime import date
 
-from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
-
 from agents import PlannerAgent, ResearcherAgent, WriterAgent, OptimizerAgent
-from tools import TavilySearchTool, CalendarTool, MetricsSimulator
-
-load_dotenv()
+from agents import planner as planner_mod, researcher as researcher_mod, writer as writer_mod
+from pipeline import Stage, StageGraph, brief_hash, current_stage, field_sink, mark_incomplete
+from tools import (
+    TavilySearchTool,
+    AsyncTavilySearchTool,
+    CalendarTool,
+    MetricsSimulator,
+    LLMCache,
+    LLMRouter,
+    CheckpointStore,
+    JSONStreamParser,
+    count_tokens,
+)
+from tools import clients
+from tools.hedging import abort_stream, ahedged_call, hedged_call
+from tools.tracing import Tracer, activate, trace_span
 
 
-def extract_json(text: str):
+def extract_json(text: str, repair: bool = False):
     """
     Extract the FIRST complete {...} block from the model output and parse it.
 
     - If the whole text is valid JSON, parse it directly.
-    - Otherwise, find the first balanced {...} block and parse that.
-    - If no balanced block exists, raise ValueError.
+    - Otherwise, find the first balanced {...} block (string-aware, so braces
+      inside quoted values don't count) and parse that.
+    - If no balanced block exists, raise ValueError, or with repair=True
+      return what survives of the truncated object (JSONStreamParser.repair).
     """
     if not text:
         raise ValueError("Model output is empty.")
@@ -30,73 +47,503 @@ def extract_json(text: str):
     except Exception:
         pass
 
-    # Fallback: find first '{' and walk to matching '}'
-    start = text.find("{")
-    if start == -1:
-        raise ValueError(f"No JSON object start found in model output:\n{text}")
-
-    depth = 0
-    end = None
-    for i, ch in enumerate(text[start:], start=start):
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                end = i + 1  # include this closing brace
+    parser = JSONStreamParser()
+    parser.feed(text)
+    return parser.repair() if repair else parser.result()
+
+
+def _parse_stream(chunks, on_field=None, cancel=None):
+    """
+    Feed streamed chat_completion chunks into a JSONStreamParser and stop
+    reading (closing the stream) as soon as the first top-level object is
+    complete, or once cancel (a hedging.Cancellation) is set, which also
+    aborts a read that is waiting on the connection.
+    """
+    parser = JSONStreamParser(on_field=on_field)
+    if cancel is not None:
+        cancel.on_set(lambda: abort_stream(chunks))
+    try:
+        for chunk in chunks:
+            parser.feed(chunk.choices[0].delta.content or "")
+            if parser.done or (cancel is not None and cancel.is_set()):
                 break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    return parser
 
-    if end is None:
-        raise ValueError(f"No complete JSON object found in model output:\n{text}")
 
-    json_str = text[start:end]
+async def _parse_stream_async(chunks, on_field=None):
+    parser = JSONStreamParser(on_field=on_field)
     try:
-        return json.loads(json_str)
-    except Exception as e:
-        raise ValueError(f"Could not parse JSON candidate:\n{json_str}\nError: {e}")
-
-
-def make_llm():
-    hf_token = os.getenv("HF_API_KEY")
-    model_id = os.getenv("HF_MODEL_ID", "meta-llama/Meta-Llama-3-8B-Instruct")
-
-    client = InferenceClient(model=model_id, token=hf_token)
-
-    def call_llm(prompt: str):
-        response = client.chat_completion(
-            model=model_id,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a senior marketing AI that ONLY responds with a "
-                        "single valid JSON object. No prose, no markdown, no bullet "
-                        "lists outside JSON, and no explanations.\n\n"
-                        "The JSON must:\n"
-                        "- Start with '{' and end with '}'.\n"
-                        "- Be valid so that json.loads() succeeds.\n"
-                        "- Contain keys like strategy_overview, target_audience, "
-                        "market_analysis, customer_journey, objectives_kpis, "
-                        "messaging_positioning, channel_strategy, budget_plan, "
-                        "trend_adaptation, analytics_feedback, campaigns, posts, etc., "
-                        "depending on the prompt.\n"
-                        "- NOT include any extremely long week-by-week execution_plan "
-                        "or verbose schedules; keep fields concise so the JSON fits "
-                        "within the token limit."
+        async for chunk in chunks:
+            parser.feed(chunk.choices[0].delta.content or "")
+            if parser.done:
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return parser
+
+
+def _read_text(chunks, cancel=None) -> str:
+    parts = []
+    if cancel is not None:
+        cancel.on_set(lambda: abort_stream(chunks))
+    try:
+        for chunk in chunks:
+            parts.append(chunk.choices[0].delta.content or "")
+            if cancel is not None and cancel.is_set():
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    return "".join(parts)
+
+
+async def _read_text_async(chunks) -> str:
+    return "".join([chunk.choices[0].delta.content or "" async for chunk in chunks])
+
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off by the length limit. Continue it from "
+    "the exact character where it stopped until the JSON object is closed. "
+    "Do not repeat anything already written and add no prose or markdown."
+)
+
+# How many continuation requests (each with the route's full max_tokens)
+# to try before falling back to a local repair of the truncated JSON
+MAX_CONTINUATIONS = 2
+
+
+def _continuation_messages(prompt: str, partial: str):
+    return _messages(prompt) + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUE_PROMPT},
+    ]
+
+
+def _strip_overlap(partial: str, text: str, min_overlap: int = 8, window: int = 300) -> str:
+    """Drop a code fence and any re-sent tail of partial from the start of a continuation."""
+    head = text.lstrip()
+    if head.startswith("```"):
+        text = head.split("\n", 1)[1] if "\n" in head else ""
+    text = text.replace("```", "")
+    for k in range(min(window, len(partial), len(text)), min_overlap - 1, -1):
+        if partial.endswith(text[:k]):
+            return text[k:]
+    return text
+
+
+def _settle(parser, partial: str, span):
+    """
+    Result of a call whose first response was truncated, after continuation
+    requests have been fed into parser: the completed object if the
+    continuation closed it cleanly, otherwise a local repair of the original
+    partial text. Returns (result, complete).
+    """
+    if parser.done:
+        try:
+            result = parser.result()
+            span.set(recovery="continuation")
+            return result, True
+        except ValueError:
+            pass
+    original = JSONStreamParser()
+    original.feed(partial)
+    span.set(recovery="repair")
+    # keep the partial object out of the stage memo and checkpoints too
+    mark_incomplete()
+    return original.repair(), False
+
+
+def _record_completion(span, parser) -> int:
+    tokens = count_tokens(parser.text)
+    span.set(completion_tokens=tokens, parse_ms=round(parser.parse_seconds * 1000, 3))
+    return tokens
+
+
+def _replay_fields(result, on_field):
+    if on_field is not None and isinstance(result, dict):
+        for key, value in result.items():
+            on_field(key, value)
+
+
+SYSTEM_PROMPT = (
+    "You are a senior marketing AI that ONLY responds with a "
+    "single valid JSON object. No prose, no markdown, no bullet "
+    "lists outside JSON, and no explanations.\n\n"
+    "The JSON must:\n"
+    "- Start with '{' and end with '}'.\n"
+    "- Be valid so that json.loads() succeeds.\n"
+    "- Contain keys like strategy_overview, target_audience, "
+    "market_analysis, customer_journey, objectives_kpis, "
+    "messaging_positioning, channel_strategy, budget_plan, "
+    "trend_adaptation, analytics_feedback, campaigns, posts, etc., "
+    "depending on the prompt.\n"
+    "- Keep fields concise so the JSON fits within the token limit."
+)
+
+
+def _llm_settings():
+    clients.load_env()
+    return os.getenv("HF_API_KEY"), clients.shared("llm_router", LLMRouter.from_env)
+
+
+def _route_call(router: LLMRouter):
+    """(stage, route, model_id, params, cache key params) for a call in the current stage."""
+    stage = current_stage()
+    route = router.route(stage)
+    params = {"max_tokens": router.max_tokens(stage), "temperature": route.temperature}
+    # max_tokens only decides whether a reply completes, and only complete
+    # replies are cached, so it stays out of the key as the budget adapts
+    key_params = {"temperature": route.temperature}
+    return stage, route, router.model(stage), params, key_params
+
+
+def _deadline(route):
+    return time.monotonic() + route.deadline if route.deadline is not None else None
+
+
+def _unless_cancelled(on_field, cancel):
+    # A hedged request that lost must not stream stale fields into the stage
+    if on_field is None:
+        return None
+    return lambda key, value: cancel.is_set() or on_field(key, value)
+
+
+def _messages(prompt: str):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _default_llm_cache() -> LLMCache:
+    return clients.shared("llm_cache", LLMCache.from_env)
+
+
+def make_llm(cache: LLMCache | None = None, router: LLMRouter | None = None):
+    """
+    Build the call_llm(prompt) closure used by every agent.
+
+    Model, temperature and max_tokens come from an LLMRouter, per pipeline
+    stage: max_tokens adapts to the stage's schema and past completion
+    lengths, and a truncated reply is continued with the route's full budget.
+
+    Parsed outputs are stored in an on-disk LLMCache keyed by model, system
+    message, prompt and temperature; pass use_cache=False to bypass it for
+    a single call, or set CMP_LLM_CACHE=0 to disable it entirely.
+
+    The completion is streamed and parsed incrementally: on_field(key, value)
+    fires as each top-level field closes, and the stream is dropped as soon as
+    the JSON object is complete so trailing tokens are never generated.
+    Inside a pipeline stage that later stages read from, on_field defaults to
+    the stage's field sink, so those stages can start before this call ends.
+
+    Every request (continuations included) goes through the shared "hf"
+    RateLimiter, which retries 429/503 responses and adapts concurrency, and
+    is abandoned with DeadlineExceeded after its route's deadline. Routes
+    with hedge=True send a duplicate request once the first has run longer
+    than the stage's p95 latency; the spans record hedged / hedge_won.
+
+    The InferenceClients, the default cache and the default router come from
+    tools.clients, so repeated calls (one per run) reuse the same connections
+    and completion-length history.
+    """
+    hf_token, default_router = _llm_settings()
+    router = router or default_router
+    limiter = clients.rate_limiter("hf")
+    if cache is None:
+        cache = _default_llm_cache()
+
+    def call_llm(prompt: str, use_cache: bool = True, on_field=None):
+        on_field = on_field or field_sink()
+        stage, route, model_id, params, key_params = _route_call(router)
+        client = clients.inference_client(model_id, hf_token, timeout=route.deadline)
+        with trace_span("llm", kind="llm", model=model_id, max_tokens=params["max_tokens"]) as span:
+            key = LLMCache.make_key(model_id, SYSTEM_PROMPT, prompt, key_params)
+            prompt_tokens = count_tokens(prompt)
+            span.set(prompt_tokens=prompt_tokens, cache_hit=False)
+            if use_cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    span.set(cache_hit=True)
+                    _replay_fields(cached, on_field)
+                    return cached
+
+            def request(cancel, primary):
+                sink = _unless_cancelled(on_field, cancel) if primary else None
+                return limiter.call(
+                    lambda: _parse_stream(
+                        client.chat_completion(model=model_id, messages=_messages(prompt), stream=True, **params),
+                        sink,
+                        cancel,
                     ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=1400,
-            temperature=0.4,
-        )
-        text = response.choices[0].message["content"]
-        return extract_json(text)
+                    tokens=prompt_tokens + params["max_tokens"],
+                    span=span,
+                    cancel=cancel,
+                )
+
+            started = time.monotonic()
+            parser, hedge_won = hedged_call(request, router.hedge_after(stage), _deadline(route), span)
+            latency = time.monotonic() - started
+            complete = True
+            if not parser.done and parser.start is not None:
+                # Cut off by max_tokens: ask for the rest instead of regenerating it all
+                partial = parser.text
+                span.set(truncated=True)
+                for attempt in range(1, MAX_CONTINUATIONS + 1):
+                    span.set(continuations=attempt)
+                    messages = _continuation_messages(prompt, parser.text)
+                    text, _ = hedged_call(
+                        lambda cancel, primary: limiter.call(
+                            lambda: _read_text(client.chat_completion(
+                                model=model_id, messages=messages, stream=True, **{**params, "max_tokens": route.max_tokens}
+                            ), cancel),
+                            tokens=prompt_tokens + count_tokens(parser.text) + route.max_tokens,
+                            span=span,
+                            cancel=cancel,
+                        ),
+                        deadline=_deadline(route),
+                        span=span,
+                    )
+                    parser.feed(_strip_overlap(parser.text, text))
+                    if parser.done or not text.strip():
+                        break
+                result, complete = _settle(parser, partial, span)
+            else:
+                result = parser.result()
+            router.record(stage, _record_completion(span, parser), latency)
+            if hedge_won:
+                _replay_fields(result, on_field)
+            # A locally repaired object is missing fields; don't pin it in the cache
+            if complete:
+                cache.set(key, result)
+            return result
+
+    call_llm.cache = cache
+    call_llm.router = router
+    return call_llm
+
+
+def make_async_llm(cache: LLMCache | None = None, router: LLMRouter | None = None):
+    """
+    Async counterpart of make_llm(), built on AsyncInferenceClient. Clients
+    are shared per event loop.
+    """
+    hf_token, default_router = _llm_settings()
+    router = router or default_router
+    limiter = clients.rate_limiter("hf")
+    if cache is None:
+        cache = _default_llm_cache()
+
+    async def call_llm(prompt: str, use_cache: bool = True, on_field=None):
+        on_field = on_field or field_sink()
+        stage, route, model_id, params, key_params = _route_call(router)
+        client = clients.async_inference_client(model_id, hf_token, timeout=route.deadline)
+        with trace_span("llm", kind="llm", model=model_id, max_tokens=params["max_tokens"]) as span:
+            key = LLMCache.make_key(model_id, SYSTEM_PROMPT, prompt, key_params)
+            prompt_tokens = count_tokens(prompt)
+            span.set(prompt_tokens=prompt_tokens, cache_hit=False)
+            if use_cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    span.set(cache_hit=True)
+                    _replay_fields(cached, on_field)
+                    return cached
+
+            async def open_and_parse(sink):
+                stream = await client.chat_completion(
+                    model=model_id, messages=_messages(prompt), stream=True, **params
+                )
+                return await _parse_stream_async(stream, sink)
 
+            def request(primary):
+                # the loser of a hedge is cancelled outright, so only the hedge needs muting
+                sink = on_field if primary else None
+                return limiter.acall(
+                    lambda: open_and_parse(sink), tokens=prompt_tokens + params["max_tokens"], span=span
+                )
+
+            started = time.monotonic()
+            parser, hedge_won = await ahedged_call(request, router.hedge_after(stage), _deadline(route), span)
+            latency = time.monotonic() - started
+            complete = True
+            if not parser.done and parser.start is not None:
+                partial = parser.text
+                span.set(truncated=True)
+                for attempt in range(1, MAX_CONTINUATIONS + 1):
+                    span.set(continuations=attempt)
+                    async def continue_request(messages=_continuation_messages(prompt, parser.text)):
+                        return await _read_text_async(await client.chat_completion(
+                            model=model_id, messages=messages, stream=True, **{**params, "max_tokens": route.max_tokens}
+                        ))
+
+                    text, _ = await ahedged_call(
+                        lambda primary: limiter.acall(
+                            continue_request,
+                            tokens=prompt_tokens + count_tokens(parser.text) + route.max_tokens,
+                            span=span,
+                        ),
+                        deadline=_deadline(route),
+                        span=span,
+                    )
+                    parser.feed(_strip_overlap(parser.text, text))
+                    if parser.done or not text.strip():
+                        break
+                result, complete = _settle(parser, partial, span)
+            else:
+                result = parser.result()
+            router.record(stage, _record_completion(span, parser), latency)
+            if hedge_won:
+                _replay_fields(result, on_field)
+            if complete:
+                cache.set(key, result)
+            return result
+
+    call_llm.cache = cache
+    call_llm.router = router
     return call_llm
 
 
-def run_campaign(brief: dict):
+def build_campaign_graph(llm, search_tool, asynchronous: bool = False) -> StageGraph:
+    """
+    Wire the agents into a StageGraph.
+
+    The web search only needs the brief and the writer only reads the
+    planner's messaging and execution plan, so neither waits on the stage
+    before it. The execution plan is planned in concurrent blocks of weeks
+    alongside the core strategy rather than in the same call. The researcher
+    and writer only read a few planner sections, so run_async() starts them
+    as soon as those have streamed out of the planner call. With
+    asynchronous=True, llm and search_tool must be async and the graph is
+    meant for run_async().
+    """
+    planner = PlannerAgent(llm)
+    researcher = ResearcherAgent(llm, search_tool)
+    writer = WriterAgent(llm)
+    optimizer = OptimizerAgent()
+    calendar_tool = CalendarTool()
+    metrics_sim = MetricsSimulator()
+
+    if asynchronous:
+        plan = planner.plan_core_strategy_async
+        plan_weeks = planner.plan_execution_async
+        enrich = researcher.enrich_and_validate_strategy_async
+        draft = writer.draft_and_review_assets_async
+    else:
+        plan = planner.plan_core_strategy
+        plan_weeks = planner.plan_execution
+        enrich = researcher.enrich_and_validate_strategy
+        draft = writer.draft_and_review_assets
+
+    # fields= lists the brief fields each stage reads, so an edit only re-runs
+    # the stages it affects when a memo is passed to run_campaign()
+    return StageGraph([
+        # 1) Strategy (using full brief) and, concurrently, its week-by-week execution plan
+        Stage("planner", lambda brief, up: plan(brief), fields=planner_mod.BRIEF_FIELDS),
+        Stage(
+            "execution_plan",
+            lambda brief, up: plan_weeks(brief),
+            fields=planner_mod.BRIEF_FIELDS + ("timeline_weeks",),
+        ),
+        # 2) Web search for the researcher; independent of the planner
+        Stage("search", lambda brief, up: search_tool.search(researcher.build_query(brief)), fields=("topic",)),
+        # 3) Validate market & trends with web + add validation_notes
+        Stage(
+            "researcher",
+            lambda brief, up: enrich(brief, up["planner"], snippets=up["search"]),
+            deps=("planner", "search"),
+            fields=researcher_mod.BRIEF_FIELDS,
+            reads={"planner": researcher_mod.STRATEGY_FIELDS},
+        ),
+        # 4) Draft campaigns + posts
+        Stage(
+            "writer",
+            lambda brief, up: draft(brief, {**up["planner"], "execution_plan": up["execution_plan"]}),
+            deps=("planner", "execution_plan"),
+            fields=writer_mod.BRIEF_FIELDS,
+            reads={"planner": writer_mod.STRATEGY_FIELDS},
+        ),
+        # 5) Simulate metrics + design experiments + pick winners
+        Stage(
+            "metrics",
+            lambda brief, up: metrics_sim.simulate(up["writer"].get("posts", [])),
+            deps=("writer",),
+            fields=(),
+        ),
+        Stage(
+            "optimizer",
+            lambda brief, up: optimizer.optimize(up["metrics"], brief, up["researcher"]),
+            deps=("metrics", "researcher"),
+            fields=("goals_kpis",),
+        ),
+        # 6) Build calendar; cheap, and depends on today's date, so never memoized
+        Stage(
+            "calendar",
+            lambda brief, up: calendar_tool.schedule(
+                up["optimizer"][0], start_date=date.today(), timeline_weeks=brief.get("timeline_weeks")
+            ),
+            deps=("optimizer",),
+            fields=("timeline_weeks",),
+            memoize=False,
+        ),
+    ])
+
+
+def _assemble_result(brief: dict, outputs: dict, tracer: Tracer, run_id=None) -> dict:
+    best_posts, experiments = outputs["optimizer"]
+    calendar, unscheduled = outputs["calendar"]
+    result = {
+        "brief": brief,
+        "strategy": {**outputs["planner"], **outputs["researcher"], "execution_plan": outputs["execution_plan"]},
+        "campaigns": outputs["writer"].get("campaigns", []),
+        "posts": best_posts,
+        "experiments": experiments,
+        "calendar": calendar,
+        "unscheduled": unscheduled,
+        # Per-stage / per-call timings; see tools.tracing.prometheus_snapshot() for totals
+        "trace": tracer.to_json(),
+    }
+    if run_id is not None:
+        result["run_id"] = run_id
+    return result
+
+
+def _default_checkpoints() -> CheckpointStore:
+    clients.load_env()
+    return clients.shared(
+        "checkpoints",
+        lambda: CheckpointStore(os.getenv("CMP_CHECKPOINT_PATH", ".cmp_cache/checkpoints.sqlite")),
+    )
+
+
+@contextmanager
+def _checkpointing(brief: dict, memo, checkpoints, run_id):
+    """Yield (memo, run_id) for a run, recording it in the checkpoint store if one is used."""
+    if checkpoints is None and run_id is None:
+        yield memo, None
+        return
+    if memo is not None:
+        raise ValueError("Pass either memo or checkpoints/run_id, not both")
+    checkpoints = checkpoints or _default_checkpoints()
+    run_id = checkpoints.start(brief, brief_hash(brief), run_id)
+    try:
+        yield checkpoints.memo(run_id), run_id
+    except BaseException as e:
+        checkpoints.finish(run_id, error=f"{type(e).__name__}: {e}"[:500])
+        e.add_note(f"Finished stages are checkpointed; resume with resume_campaign({run_id!r})")
+        raise
+    checkpoints.finish(run_id)
+
+
+def run_campaign(
+    brief: dict, llm=None, search_tool=None, on_event=None, memo=None, checkpoints=None, run_id=None
+):
     """
     brief = {
         'topic': str,
@@ -109,42 +556,130 @@ def run_campaign(brief: dict):
         'constraints': str,
         'additional_notes': str,
     }
+
+    on_event, if given, receives stage_started / stage_finished events (see
+    StageGraph) as the pipeline progresses. result["trace"] holds a span per
+    stage and per LLM/search call (wall time, tokens, JSON parse time,
+    cache hits).
+
+    Pass memo (e.g. a pipeline.StageMemo kept between calls) to re-run only
+    the stages an edited brief invalidates: changing timeline_weeks alone
+    keeps the core strategy and research, and re-plans only the weeks and
+    what is drafted from them.
+
+    Pass checkpoints (a CheckpointStore) and/or run_id to save each stage's
+    output as it finishes. result["run_id"] identifies the run; if it fails,
+    resume_campaign(run_id) re-runs only the stages that didn't finish.
     """
-    llm = make_llm()
+    llm = llm or make_llm()
+    search_tool = search_tool or TavilySearchTool()
 
-    planner = PlannerAgent(llm)
-    researcher = ResearcherAgent(llm, TavilySearchTool())
-    writer = WriterAgent(llm)
-    optimizer = OptimizerAgent()
-    calendar_tool = CalendarTool()
-    metrics_sim = MetricsSimulator()
+    graph = build_campaign_graph(llm, search_tool)
+    with _checkpointing(brief, memo, checkpoints, run_id) as (memo, run_id):
+        with activate(Tracer()) as tracer:
+            outputs = graph.run(brief, on_event=on_event, memo=memo)
+    return _assemble_result(brief, outputs, tracer, run_id)
 
-    # 1) Strategy v2 (two-pass planner, using full brief)
-    strategy = planner.plan_strategy_and_campaign(brief)
 
-    # 2) Validate market & trends with web + add validation_notes
-    strategy = researcher.enrich_and_validate_strategy(brief, strategy)
+def resume_campaign(run_id: str, llm=None, search_tool=None, on_event=None, checkpoints=None):
+    """Continue a checkpointed run from its last finished stages."""
+    checkpoints = checkpoints or _default_checkpoints()
+    return run_campaign(
+        checkpoints.brief(run_id), llm=llm, search_tool=search_tool, on_event=on_event,
+        checkpoints=checkpoints, run_id=run_id,
+    )
 
-    # 3) Draft campaigns + posts with review pass
-    assets = writer.draft_and_review_assets(brief, strategy)
-    campaigns = assets.get("campaigns", [])
-    posts = assets.get("posts", [])
 
-    # 4) Simulate metrics + design experiments + pick winners
-    scored_posts = metrics_sim.simulate(posts)
-    best_posts, experiments = optimizer.optimize(scored_posts, brief, strategy)
+async def run_campaign_async(
+    brief: dict, llm=None, search_tool=None, on_event=None, memo=None, checkpoints=None, run_id=None
+):
+    """
+    Same result as run_campaign(), but stages run as soon as their inputs are
+    ready: the web search overlaps the planner, and the writer overlaps the
+    researcher.
+    """
+    llm = llm or make_async_llm()
+    search_tool = search_tool or AsyncTavilySearchTool()
 
-    # 5) Build calendar
-    calendar = calendar_tool.build_calendar(best_posts, start_date=date.today())
+    graph = build_campaign_graph(llm, search_tool, asynchronous=True)
+    with _checkpointing(brief, memo, checkpoints, run_id) as (memo, run_id):
+        with activate(Tracer()) as tracer:
+            outputs = await graph.run_async(brief, on_event=on_event, memo=memo)
+    return _assemble_result(brief, outputs, tracer, run_id)
 
-    return {
-        "brief": brief,
-        "strategy": strategy,
-        "campaigns": campaigns,
-        "posts": best_posts,
-        "experiments": experiments,
-        "calendar": calendar,
-    }
+
+def iter_campaign_events(brief: dict, llm=None, search_tool=None, loop=None, memo=None):
+    """
+    Run run_campaign_async() on a background event loop and yield its events
+    as they happen, e.g. to render the strategy while research and writing
+    are still in flight:
+
+        {"type": "stage_started", "stage": "planner"}
+        {"type": "stage_finished", "stage": "planner", "data": strategy}
+        ...
+        {"type": "result", "data": result}
+
+    By default each call gets a fresh loop in its own thread; pass a running
+    loop (see tools.clients.background_loop) to reuse its async clients
+    across runs.
+
+    Exceptions raised by the pipeline are re-raised in the caller. If the
+    caller stops iterating early (e.g. a Streamlit rerun closes the
+    generator), the background run is cancelled so no further LLM calls are
+    paid for.
+    """
+    events = queue.Queue()
+    done = object()
+    control = {}
+    stopped = threading.Event()
+
+    async def run():
+        control["task"] = asyncio.current_task()
+        if stopped.is_set():
+            raise asyncio.CancelledError
+        return await run_campaign_async(
+            brief, llm=llm, search_tool=search_tool, on_event=events.put, memo=memo
+        )
+
+    def deliver(get_result):
+        try:
+            events.put({"type": "result", "data": get_result()})
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(done)
+
+    thread = None
+    if loop is None:
+        thread = threading.Thread(
+            target=deliver, args=(lambda: asyncio.run(run()),), name="cmp-pipeline", daemon=True
+        )
+        thread.start()
+        running = thread.is_alive
+    else:
+        future = asyncio.run_coroutine_threadsafe(run(), loop)
+        future.add_done_callback(lambda f: deliver(f.result))
+        running = lambda: not future.done()
+
+    try:
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+    finally:
+        if running():
+            stopped.set()
+            task = control.get("task")
+            if task is not None:
+                try:
+                    task.get_loop().call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    pass  # loop already closed: the run finished on its own
+        elif thread is not None:
+            thread.join()
 
 
 if __name__ == "__main__":
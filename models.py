@@ -0,0 +1,276 @@
+"""
+Typed views of CMP results.
+
+LLM output is loosely shaped: lists sometimes arrive as "['a', 'b']"
+strings, the same idea comes under different keys (pain_points /
+painpoints, budget / total_budget), and sections switch between dicts,
+lists and plain strings. These models absorb all of that once, at
+validation time, so rendering code can rely on plain attributes.
+
+    plan = CampaignPlan.from_result(run_campaign(brief))
+    plan = CampaignPlan.model_validate_json(line)  # straight from raw JSON text
+
+Posts and calendar entries are slotted dataclasses, since a batch of
+plans can hold thousands of them.
+"""
+import ast
+import json
+from datetime import date as Date
+from typing import Annotated, Any, Dict, List, Optional
+
+from pydantic import AliasChoices, BaseModel, BeforeValidator, ConfigDict, Field, TypeAdapter, model_validator
+from pydantic.dataclasses import dataclass
+
+
+def to_list(value: Any) -> List[Any]:
+    """None -> [], "['a', 'b']" -> ["a", "b"], scalar -> [scalar]."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("[") and text.endswith("]"):
+            for parse in (json.loads, ast.literal_eval):
+                try:
+                    parsed = parse(text)
+                except (ValueError, SyntaxError):
+                    continue
+                if isinstance(parsed, list):
+                    return parsed
+    return [value]
+
+
+def to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    return str(value)
+
+
+def _either(*keys: str) -> Any:
+    return Field(default="", validation_alias=AliasChoices(*keys))
+
+
+Text = Annotated[str, BeforeValidator(to_text)]
+TextList = Annotated[List[Text], BeforeValidator(to_list)]
+AnyList = Annotated[List[Any], BeforeValidator(to_list)]
+
+
+class Section(BaseModel):
+    # Models add keys we don't render; keep them rather than fail
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _from_scalar(cls, value: Any) -> Any:
+        # Some sections come back as a bare string or list instead of an object
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            return cls._wrap(value)
+        return value
+
+    @classmethod
+    def _wrap(cls, value: Any) -> Dict[str, Any]:
+        return {"description": to_text(value)}
+
+
+class StrategyOverview(Section):
+    summary: Text = ""
+    key_messages: TextList = []
+    channels: TextList = []
+
+    @classmethod
+    def _wrap(cls, value):
+        return {"summary": to_text(value)}
+
+
+class TargetAudience(Section):
+    description: Text = _either("description", "segment")
+    location: Text = ""
+    pain_points: TextList = Field(default=[], validation_alias=AliasChoices("pain_points", "painpoints"))
+    interests: TextList = []
+
+
+class MarketAnalysis(Section):
+    market_size: Text = ""
+    market_trends: TextList = []
+    competitor_analysis: TextList = []
+    market_insights: TextList = []
+
+    @classmethod
+    def _wrap(cls, value):
+        return {"market_insights": to_list(value)}
+
+
+class JourneyStage(Section):
+    stage: Text = ""
+    description: Text = ""
+    key_messages: TextList = []
+
+
+class ObjectivesKpis(Section):
+    objectives: Text = _either("description", "objectives")
+    kpis: TextList = Field(default=[], validation_alias=AliasChoices("kpis", "kpi"))
+    items: TextList = []
+
+    @classmethod
+    def _wrap(cls, value):
+        items = []
+        for item in to_list(value):
+            if isinstance(item, dict):
+                item = item.get("description") or item.get("objective") or item.get("name")
+            if item:
+                items.append(item)
+        return {"items": items}
+
+
+class MessagingPositioning(Section):
+    messaging: Text = _either("messaging", "positioning_statement")
+    positioning: Text = _either("positioning", "unique_value_proposition")
+    key_messages: TextList = []
+
+
+class ChannelStrategy(Section):
+    channels: TextList = []
+
+    @classmethod
+    def _wrap(cls, value):
+        return {"channels": to_list(value)}
+
+
+class BudgetItem(Section):
+    label: Text = Field(default="Item", validation_alias=AliasChoices("category", "channel", "item", "label"))
+    amount: Text = _either("allocation", "budget", "cost", "amount")
+    notes: Text = ""
+
+    @classmethod
+    def _wrap(cls, value):
+        return {"label": to_text(value)}
+
+
+class BudgetPlan(Section):
+    total_budget: Text = _either("budget", "total_budget")
+    notes: Text = _either("notes", "description")
+    allocation: Annotated[List[BudgetItem], BeforeValidator(to_list)] = Field(
+        default=[], validation_alias=AliasChoices("allocation", "items", "breakdown")
+    )
+
+
+class TrendAdaptation(Section):
+    strategy: Text = _either("strategy", "description")
+    trend_sources: TextList = []
+
+
+class AnalyticsFeedback(Section):
+    description: Text = _either("description", "summary")
+    kpis: TextList = Field(default=[], validation_alias=AliasChoices("kpis", "metrics"))
+    feedback_loops: TextList = Field(default=[], validation_alias=AliasChoices("feedback_loops", "processes"))
+    tools: TextList = []
+
+
+class ExecutionWeek(Section):
+    week_number: Optional[int] = None
+    theme: Text = ""
+    main_objective: Text = ""
+    key_message: Text = ""
+    channels: TextList = []
+    campaign_ideas: TextList = []
+
+
+def _journey(value: Any) -> List[Any]:
+    # {"Awareness": {...}, "Consideration": "..."} -> [{"stage": "Awareness", ...}, ...]
+    if isinstance(value, dict):
+        return [
+            {"stage": name, **data} if isinstance(data, dict) else {"stage": name, "description": data}
+            for name, data in value.items()
+        ]
+    return [s if isinstance(s, dict) else {"description": s} for s in to_list(value)]
+
+
+class Strategy(Section):
+    strategy_overview: StrategyOverview = StrategyOverview()
+    target_audience: TargetAudience = TargetAudience()
+    market_analysis: MarketAnalysis = MarketAnalysis()
+    customer_journey: Annotated[List[JourneyStage], BeforeValidator(_journey)] = []
+    objectives_kpis: ObjectivesKpis = ObjectivesKpis()
+    messaging_positioning: MessagingPositioning = MessagingPositioning()
+    channel_strategy: ChannelStrategy = ChannelStrategy()
+    budget_plan: BudgetPlan = BudgetPlan()
+    trend_adaptation: TrendAdaptation = TrendAdaptation()
+    analytics_feedback: AnalyticsFeedback = AnalyticsFeedback()
+    execution_plan: Annotated[List[ExecutionWeek], BeforeValidator(to_list)] = []
+    validation_notes: TextList = []
+
+
+class Campaign(Section):
+    campaign_name: Text = ""
+    goal: Text = ""
+    key_message: Text = ""
+    main_channel: Text = ""
+    suggested_creative_idea: Text = ""
+
+    @classmethod
+    def _wrap(cls, value):
+        return {"campaign_name": to_text(value)}
+
+
+class Experiment(Section):
+    name: Text = ""
+    hypothesis: Text = ""
+    primary_kpi: Text = ""
+    duration: Text = ""
+    notes: Text = ""
+
+
+@dataclass(slots=True)
+class Post:
+    campaign_name: Text = ""
+    channel: Text = ""
+    copy: Text = ""
+    cta: Text = ""
+    clicks: Optional[int] = None
+    impressions: Optional[int] = None
+    ctr: Optional[float] = None
+    ctr_std: Optional[float] = None
+    ctr_p5: Optional[float] = None
+    ctr_p95: Optional[float] = None
+
+
+@dataclass(slots=True)
+class CalendarEntry:
+    date: Date
+    campaign_name: Text = ""
+    channel: Text = ""
+    copy: Text = ""
+    cta: Text = ""
+    clicks: Optional[int] = None
+    impressions: Optional[int] = None
+    ctr: Optional[float] = None
+
+
+PostList = Annotated[List[Post], BeforeValidator(to_list)]
+
+
+class CampaignPlan(BaseModel):
+    """A validated run_campaign() result."""
+
+    brief: Dict[str, Any] = {}
+    strategy: Strategy = Strategy()
+    campaigns: Annotated[List[Campaign], BeforeValidator(to_list)] = []
+    posts: PostList = []
+    experiments: Annotated[List[Experiment], BeforeValidator(to_list)] = []
+    calendar: Annotated[List[CalendarEntry], BeforeValidator(to_list)] = []
+    unscheduled: PostList = []
+    trace: Dict[str, Any] = {}
+    run_id: Optional[str] = None
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "CampaignPlan":
+        return cls.model_validate(result)
+
+
+posts_adapter = TypeAdapter(PostList)
+campaigns_adapter = TypeAdapter(Annotated[List[Campaign], BeforeValidator(to_list)])
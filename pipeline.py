@@ -0,0 +1,373 @@
+import asyncio
+import contextvars
+import hashlib
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from tools.tracing import trace_span
+
+_field_sink: ContextVar[Optional[Callable[[str, Any], None]]] = ContextVar("cmp_field_sink", default=None)
+_stage: ContextVar[Optional[str]] = ContextVar("cmp_stage", default=None)
+_incomplete: ContextVar[Optional[List[bool]]] = ContextVar("cmp_incomplete", default=None)
+
+
+def _ignore_event(event: Dict[str, Any]) -> None:
+    pass
+
+
+def field_sink() -> Optional[Callable[[str, Any], None]]:
+    """
+    on_field(key, value) callback of the stage running in this context, or
+    None. LLM clients stream each top-level field of their output into it,
+    so run_async() can start the stages that read those fields early.
+    """
+    return _field_sink.get()
+
+
+def current_stage() -> Optional[str]:
+    """Name of the stage running in this context (and its tasks), or None."""
+    return _stage.get()
+
+
+def mark_incomplete() -> None:
+    """
+    Flag the running stage's output as incomplete (e.g. built from a locally
+    repaired LLM reply). It is still used for this run, but it and the
+    stages downstream of it are not written to the memo, so a later edit or
+    resume runs them again instead of reusing a partial result.
+    """
+    marks = _incomplete.get()
+    if marks is not None:
+        marks.append(True)
+
+
+class Stage:
+    """
+    One step of the campaign pipeline.
+
+    fn(brief, inputs) receives the brief and a dict of upstream outputs keyed
+    by stage name, and may return a value or an awaitable.
+
+    fields names the brief fields the stage reads (None = the whole brief);
+    fn only sees those fields, so the declaration can't drift from what the
+    stage actually uses. Together with deps it decides when a memoized output
+    is still valid. Set memoize=False for cheap stages that depend on
+    something outside the brief (e.g. today's date).
+
+    reads maps a dep to the top-level keys of its output the stage uses;
+    fn only sees those keys. run_async() starts such a stage speculatively
+    as soon as the keys have streamed out of the running dep, and re-runs it
+    if the dep's final output has different values for them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any], Dict[str, Any]], Any],
+        deps: Iterable[str] = (),
+        fields: Optional[Iterable[str]] = None,
+        memoize: bool = True,
+        reads: Optional[Dict[str, Iterable[str]]] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.fields = tuple(fields) if fields is not None else None
+        self.memoize = memoize
+        self.reads = {dep: tuple(keys) for dep, keys in (reads or {}).items()}
+        unknown = set(self.reads) - set(self.deps)
+        if unknown:
+            raise ValueError(f"Stage '{name}' reads from non-dependencies: {sorted(unknown)}")
+
+    def view(self, brief: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return brief
+        return {f: brief[f] for f in self.fields if f in brief}
+
+    def take(self, dep: str, output: Any) -> Any:
+        """The part of dep's output this stage reads."""
+        keys = self.reads.get(dep)
+        if keys is None or not isinstance(output, dict):
+            return output
+        return {k: output[k] for k in keys if k in output}
+
+
+class StageMemo:
+    """
+    In-process store of stage outputs keyed by StageGraph.stage_keys(),
+    least recently used evicted first. Outputs are shared, not copied, so
+    stages must not mutate their inputs. The UI also keeps finished plans
+    in one.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+class StageGraph:
+    """
+    Dependency graph of stages.
+
+    Both run() and run_async() start every stage as soon as its
+    dependencies are done, so independent stages (e.g. web search and the
+    planner) overlap: run() on worker threads, run_async() as tasks. With
+    run_async(), a stage that declares
+    reads= starts as soon as the fields it reads have streamed (see
+    field_sink()); its started event then carries "speculative": True, and
+    a second started event follows if it had to be re-run.
+
+    Both accept on_event(event), called with {"type": "stage_started",
+    "stage": name} and {"type": "stage_finished", "stage": name, "data": output}.
+
+    Both also accept memo (anything with get(key) / set(key, value), e.g. a
+    StageMemo). A stage whose key is in the memo is not run: its output is
+    reused and its finished event carries "memoized": True. Keys hash the
+    stage's brief fields and its upstream keys, so editing one brief field
+    only re-runs the stages downstream of the ones that read it. A memo
+    should only be shared by graphs built the same way (same models, etc.).
+    Outputs flagged with mark_incomplete(), and everything downstream of
+    them, are never written to it.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {s.name: s for s in stages}
+        self.order = self._toposort(stages)
+
+    def _toposort(self, stages: List[Stage]) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in stage graph at '{name}'")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for s in stages:
+            visit(s.name)
+        return order
+
+    def stage_keys(self, brief: Dict[str, Any]) -> Dict[str, str]:
+        """Memo key per stage: a hash of its brief fields and its upstream keys."""
+        keys: Dict[str, str] = {}
+        for name in self.order:
+            stage = self.stages[name]
+            payload = {"stage": name, "brief": stage.view(brief), "deps": [keys[d] for d in stage.deps]}
+            keys[name] = brief_hash(payload)
+        return keys
+
+    def _tainted(self, name: str, incomplete: set) -> bool:
+        """Whether name or anything upstream of it produced an incomplete output."""
+        return name in incomplete or any(self._tainted(d, incomplete) for d in self.stages[name].deps)
+
+    def _recall(self, memo, key: Optional[str], name: str, emit) -> Any:
+        """Return the memoized output for a stage (emitting its events), or None."""
+        if memo is None or key is None:
+            return None
+        result = memo.get(key)
+        if result is not None:
+            emit({"type": "stage_started", "stage": name})
+            with trace_span(name, memoized=True):
+                pass
+            emit({"type": "stage_finished", "stage": name, "data": result, "memoized": True})
+        return result
+
+    def run(
+        self,
+        brief: Dict[str, Any],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        memo=None,
+    ) -> Dict[str, Any]:
+        emit = on_event or _ignore_event
+        keys = self.stage_keys(brief) if memo is not None else {}
+        outputs: Dict[str, Any] = {}
+        incomplete: set = set()
+        waiting = list(self.order)
+        running: Dict[Any, str] = {}
+
+        def execute(stage: Stage, inputs: Dict[str, Any]) -> Any:
+            marks: List[bool] = []
+            with trace_span(stage.name):
+                token, marks_token = _stage.set(stage.name), _incomplete.set(marks)
+                try:
+                    result = stage.fn(stage.view(brief), inputs)
+                finally:
+                    _incomplete.reset(marks_token)
+                    _stage.reset(token)
+                if inspect.isawaitable(result):
+                    raise TypeError(f"Stage '{stage.name}' is async; use run_async()")
+            if marks:
+                incomplete.add(stage.name)
+            return result
+
+        # Stages whose deps are done run side by side on worker threads;
+        # events, memo writes and outputs are handled on the calling thread
+        with ThreadPoolExecutor(max_workers=len(self.order), thread_name_prefix="cmp-stage") as pool:
+            while waiting or running:
+                for name in [n for n in waiting if all(d in outputs for d in self.stages[n].deps)]:
+                    waiting.remove(name)
+                    stage = self.stages[name]
+                    key = keys.get(name) if stage.memoize else None
+                    result = self._recall(memo, key, name, emit)
+                    if result is not None:
+                        outputs[name] = result
+                        continue
+                    emit({"type": "stage_started", "stage": name})
+                    inputs = {d: stage.take(d, outputs[d]) for d in stage.deps}
+                    future = pool.submit(contextvars.copy_context().run, execute, stage, inputs)
+                    running[future] = name
+                if not running:
+                    continue  # memoized stages may have readied others
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = future.result()
+                    key = keys.get(name) if self.stages[name].memoize else None
+                    if key is not None and not self._tainted(name, incomplete):
+                        memo.set(key, result)
+                    emit({"type": "stage_finished", "stage": name, "data": result})
+                    outputs[name] = result
+        return {name: outputs[name] for name in self.order}
+
+    async def run_async(
+        self,
+        brief: Dict[str, Any],
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        memo=None,
+    ) -> Dict[str, Any]:
+        emit = on_event or _ignore_event
+        keys = self.stage_keys(brief) if memo is not None else {}
+        tasks: Dict[str, asyncio.Task] = {}
+        incomplete: set = set()
+        read_from = {dep for stage in self.stages.values() for dep in stage.reads}
+        # Fields streamed so far by running stages that others read from, and
+        # an event (replaced on every set) that wakes stages waiting on them
+        streamed: Dict[str, Dict[str, Any]] = {name: {} for name in read_from}
+        changed: Dict[str, asyncio.Event] = {name: asyncio.Event() for name in read_from}
+
+        def notify(name: str) -> None:
+            event, changed[name] = changed[name], asyncio.Event()
+            event.set()
+
+        def stream_into(name: str) -> Callable[[str, Any], None]:
+            def on_field(key: str, value: Any) -> None:
+                streamed[name][key] = value
+                notify(name)
+
+            return on_field
+
+        async def execute(stage: Stage, inputs: Dict[str, Any], spans: List[Any], **attrs) -> Any:
+            marks: List[bool] = []
+            with trace_span(stage.name, **attrs) as span:
+                spans.append(span)
+                stage_token, marks_token = _stage.set(stage.name), _incomplete.set(marks)
+                sink_token = _field_sink.set(stream_into(stage.name)) if stage.name in read_from else None
+                try:
+                    result = stage.fn(stage.view(brief), inputs)
+                    if inspect.isawaitable(result):
+                        result = await result
+                finally:
+                    if sink_token is not None:
+                        _field_sink.reset(sink_token)
+                    _incomplete.reset(marks_token)
+                    _stage.reset(stage_token)
+            if marks:
+                incomplete.add(stage.name)
+            return result
+
+        async def early_inputs(stage: Stage):
+            """Inputs once every read field has streamed, and whether they are all final."""
+            inputs, final = {}, True
+            for dep in stage.deps:
+                wanted = stage.reads.get(dep)
+                if wanted is not None:
+                    while not tasks[dep].done() and not all(k in streamed[dep] for k in wanted):
+                        await changed[dep].wait()
+                    if not tasks[dep].done():
+                        inputs[dep] = {k: streamed[dep][k] for k in wanted}
+                        final = False
+                        continue
+                inputs[dep] = stage.take(dep, await tasks[dep])
+            return inputs, final
+
+        async def run_stage(stage: Stage):
+            key = keys.get(stage.name) if stage.memoize else None
+            result = self._recall(memo, key, stage.name, emit)
+            if result is not None:
+                return result
+            inputs, final = await early_inputs(stage)
+            spans: List[Any] = []
+            if final:
+                emit({"type": "stage_started", "stage": stage.name})
+                result = await execute(stage, inputs, spans)
+            else:
+                emit({"type": "stage_started", "stage": stage.name, "speculative": True})
+                run = asyncio.ensure_future(execute(stage, inputs, spans, speculative=True))
+                try:
+                    confirmed = {dep: stage.take(dep, await tasks[dep]) for dep in stage.deps}
+                    if confirmed != inputs:
+                        # The dep's final output changed a field we started from: start over
+                        run.cancel()
+                        await asyncio.gather(run, return_exceptions=True)
+                        for span in spans:
+                            span.set(discarded=True)
+                        emit({"type": "stage_started", "stage": stage.name})
+                        run = asyncio.ensure_future(execute(stage, confirmed, []))
+                    result = await run
+                except BaseException:
+                    run.cancel()
+                    await asyncio.gather(run, return_exceptions=True)
+                    raise
+            if key is not None and not self._tainted(stage.name, incomplete):
+                memo.set(key, result)
+            emit({"type": "stage_finished", "stage": stage.name, "data": result})
+            return result
+
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+        for name in read_from:
+            tasks[name].add_done_callback(lambda task, name=name: notify(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+
+def brief_hash(brief: Dict[str, Any]) -> str:
+    """Stable content hash of a brief, independent of key order."""
+    payload = json.dumps(brief, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
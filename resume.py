@@ -0,0 +1,63 @@
+"""
+Resume checkpointed runs.
+
+    python resume.py                     # list runs that didn't finish
+    python resume.py RUN_ID -o plan.json # continue one from its last finished stage
+
+Runs are checkpointed when run_campaign() is given checkpoints= or run_id=;
+the store lives at CMP_CHECKPOINT_PATH (default .cmp_cache/checkpoints.sqlite).
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import Optional
+
+from main import _default_checkpoints, build_campaign_graph, resume_campaign
+
+
+def finished_stages(store, run_id: str) -> list:
+    """Names of the stages run_id has checkpointed, in pipeline order."""
+    keys = build_campaign_graph(None, None).stage_keys(store.brief(run_id))
+    done = store.keys(run_id)
+    return [name for name, key in keys.items() if key in done]
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resume a checkpointed CMP run.")
+    parser.add_argument("run_id", nargs="?", help="run to resume; omit to list unfinished runs")
+    parser.add_argument("-o", "--output", help="write the result JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    store = _default_checkpoints()
+
+    if args.run_id is None:
+        runs = [r for r in store.runs() if r["status"] != "done"]
+        if not runs:
+            print("No unfinished runs.")
+        for r in runs:
+            updated = datetime.fromtimestamp(r["updated"]).strftime("%Y-%m-%d %H:%M")
+            stages = ", ".join(finished_stages(store, r["run_id"])) or "-"
+            print(f"{r['run_id']}  {r['status']:8} {updated}  finished: {stages}")
+            if r["error"]:
+                print(f"    {r['error']}")
+        return 0
+
+    try:
+        result = resume_campaign(args.run_id, checkpoints=store)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 2
+
+    text = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Run {args.run_id} finished; result written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,539 @@
+import time
+
+import pytest
+
+from tools import LLMCache, JSONStreamParser
+
+
+def test_llm_cache_roundtrip_and_counters(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm.sqlite"))
+    key = LLMCache.make_key("m", "sys", "prompt", {"max_tokens": 10, "temperature": 0.4})
+
+    assert cache.get(key) is None
+    cache.set(key, {"campaigns": [1, 2]})
+    assert cache.get(key) == {"campaigns": [1, 2]}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_llm_cache_key_depends_on_sampling_params():
+    a = LLMCache.make_key("m", "sys", "p", {"temperature": 0.4})
+    b = LLMCache.make_key("m", "sys", "p", {"temperature": 0.7})
+    assert a != b
+
+
+def test_llm_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm.sqlite"), max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_llm_cache_ttl_and_bypass(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm.sqlite"), ttl_seconds=0)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+    disabled = LLMCache(path=str(tmp_path / "other.sqlite"), enabled=False)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_json_stream_parser_emits_fields_as_they_close():
+    seen = []
+    parser = JSONStreamParser(on_field=lambda k, v: seen.append(k))
+    text = 'Sure! {"a": {"x": "}{"}, "b": ["q\\"uote", 2], "c": 3} trailing {"ignored": 1}'
+
+    for i in range(0, len(text), 3):
+        parser.feed(text[i:i + 3])
+        if parser.done:
+            break
+
+    assert parser.done
+    assert seen == ["a", "b", "c"]
+    assert parser.result() == {"a": {"x": "}{"}, "b": ['q"uote', 2], "c": 3}
+
+
+def test_json_stream_parser_reports_incomplete_object():
+    parser = JSONStreamParser()
+    parser.feed('{"a": 1, "b": [1, 2')
+    assert not parser.done
+    assert parser.fields == {"a": 1}
+    with pytest.raises(ValueError, match="No complete JSON object"):
+        parser.result()
+
+
+def test_json_stream_repair_keeps_complete_part_of_truncated_object():
+    from tools.json_stream import close_partial
+
+    parser = JSONStreamParser()
+    parser.feed('Sure! {"summary": "a \\"quoted\\" plan", "weeks": [{"n": 1, "theme": "Launch"}, {"n": 2, "the')
+    with pytest.raises(ValueError, match="No complete JSON object"):
+        parser.result()
+    assert parser.repair() == {
+        "summary": 'a "quoted" plan',
+        "weeks": [{"n": 1, "theme": "Launch"}, {"n": 2}],
+    }
+
+    assert close_partial('{"a": 12') is None  # the number might have had more digits
+    assert close_partial('{"a": "x", "b"') == {"a": "x"}
+    assert close_partial('{"a": [[1, 2], [') == {"a": [[1, 2]]}
+
+
+def test_compact_results_keeps_only_title_url_content():
+    from tools.tavily_search import compact_results
+
+    res = {
+        "query": "q",
+        "response_time": 1.2,
+        "results": [
+            {"title": "T", "url": "https://x.io", "content": "  some\n text ", "score": 0.9, "raw_content": None}
+        ],
+    }
+    assert compact_results(res) == "- T (https://x.io): some text"
+
+
+def test_search_tool_coalesces_and_caches_normalized_queries(tmp_path):
+    import threading
+    from tools import TavilySearchTool
+
+    calls = []
+
+    class FakeClient:
+        def search(self, query, max_results):
+            calls.append(query)
+            time.sleep(0.05)
+            return {"results": [{"title": "T", "url": "u", "content": "c"}]}
+
+    tool = TavilySearchTool(cache=LLMCache(path=str(tmp_path / "search.sqlite")))
+    tool.client = FakeClient()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda q=q: results.append(tool.search(q)))
+        for q in ["AI tools", "ai  TOOLS", " ai tools "]
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tool.search("Ai Tools") == "- T (u): c"
+
+    assert len(calls) == 1
+    assert results == ["- T (u): c"] * 3
+
+
+def test_prompt_builder_serializes_compactly_and_drops_empty_fields():
+    from tools import PromptBuilder
+
+    prompt = PromptBuilder(1000).text("Intro.").add("BRIEF", {"topic": "AI", "notes": "", "tags": []}).build()
+    assert prompt == 'Intro.\n\nBRIEF:\n{"topic":"AI"}'
+
+
+def test_prompt_builder_trims_lowest_priority_section_first():
+    from tools import PromptBuilder, count_tokens
+
+    snippets = "\n".join(f"- result {i}: " + "lorem ipsum dolor " * 40 for i in range(20))
+    builder = (
+        PromptBuilder(300)
+        .text("You are a validator.")
+        .add("STRATEGY", {"market_analysis": "keep me intact"}, priority=1)
+        .add("WEB_SNIPPETS", snippets, priority=0)
+        .text("TASK: return JSON.")
+    )
+    prompt = builder.build()
+
+    assert count_tokens(prompt) <= 300
+    assert '{"market_analysis":"keep me intact"}' in prompt
+    assert "- result 0:" in prompt
+    assert "- result 19:" not in prompt
+    assert prompt.endswith("TASK: return JSON.")
+
+
+def test_metrics_simulator_is_seeded_and_reports_bands():
+    from tools import MetricsSimulator
+
+    posts = [{"copy": f"post {i}"} for i in range(500)]
+    a = MetricsSimulator(trials=40, seed=7).simulate(posts)
+    b = MetricsSimulator(trials=40, seed=7).simulate(posts)
+
+    assert a == b
+    assert a[0]["copy"] == "post 0"
+    assert all(p["ctr_p5"] <= p["ctr"] <= p["ctr_p95"] for p in a)
+    assert all(500 <= p["impressions"] <= 5000 for p in a)
+
+    assert MetricsSimulator(trials=1, seed=7).simulate(posts[:3])[0]["ctr_p5"] >= 0
+    with pytest.raises(ValueError):
+        MetricsSimulator(trials=0)
+
+
+def test_calendar_respects_window_cadence_blackouts_and_campaign_gap():
+    from datetime import date
+    from tools import CalendarTool
+
+    start = date(2026, 1, 5)
+    posts = [{"campaign_name": f"C{i % 3}", "channel": "LinkedIn", "copy": str(i)} for i in range(14)]
+    posts += [{"campaign_name": "C0", "channel": "email", "copy": "mail"}]
+    tool = CalendarTool(cadence={"linkedin": 3}, campaign_gap_days=2, blackout_dates=[start])
+
+    scheduled, unscheduled = tool.schedule(posts, start_date=start, timeline_weeks=4)
+
+    assert len(scheduled) + len(unscheduled) == len(posts)
+    days = [(date.fromisoformat(p["date"]) - start).days for p in scheduled]
+    assert all(0 < d < 28 for d in days)
+    linkedin = [d for p, d in zip(scheduled, days) if p["channel"] == "LinkedIn"]
+    assert len(linkedin) == len(set(linkedin)) == 12  # 3/week for 4 weeks, 2 don't fit
+    for week in range(4):
+        assert sum(1 for d in linkedin if d // 7 == week) <= 3
+    for campaign in ("C0", "C1", "C2"):
+        cdays = sorted(d for p, d in zip(scheduled, days) if p["campaign_name"] == campaign)
+        assert all(b - a >= 2 for a, b in zip(cdays, cdays[1:]))
+    assert days == sorted(days)
+
+
+def test_calendar_scales_to_thousands_of_posts():
+    from datetime import date
+    from tools import CalendarTool
+
+    posts = [
+        {"campaign_name": f"C{i % 200}", "channel": ["LinkedIn", "blog", "x", "email"][i % 4]}
+        for i in range(5000)
+    ]
+    start = time.perf_counter()
+    scheduled, unscheduled = CalendarTool().schedule(posts, start_date=date(2026, 1, 1))
+    assert time.perf_counter() - start < 1.0
+    assert len(scheduled) + len(unscheduled) == 5000
+
+
+def test_hf_analyzer_sentiment_keywords_and_throughput():
+    from tools import HFAnalyzer
+
+    analyzer = HFAnalyzer()
+    assert analyzer.analyze_sentiment("Save hours with simple, reliable automation.") == "positive"
+    assert analyzer.analyze_sentiment("Manual invoicing is slow and frustrating.") == "negative"
+    assert analyzer.analyze_sentiment("This is not easy.") == "negative"
+    assert analyzer.analyze_sentiment("Read the report on Tuesday.") == "neutral"
+
+    texts = [
+        "AI automation for small businesses: automate invoicing and save time.",
+        "Small businesses can automate scheduling with AI automation.",
+        "Book a demo of our invoicing tool today.",
+    ]
+    keywords = analyzer.extract_keywords_batch(texts, top_k=3)
+    assert "automate invoicing" in keywords[0]
+    assert all(len(k) <= 3 for k in keywords)
+
+    batch = [f"Post {i}: boost growth with simple AI automation for your team {i % 50}" for i in range(5000)]
+    start = time.perf_counter()
+    tags = analyzer.analyze_batch(batch)
+    assert time.perf_counter() - start < 2.0
+    assert tags[0]["sentiment"] == "positive"
+
+
+def test_tracer_nests_spans_and_exports_metrics():
+    from tools import Tracer, trace_span, prometheus_snapshot
+    from tools.tracing import activate
+
+    with activate(Tracer()) as tracer:
+        with trace_span("writer"):
+            with trace_span("llm", kind="llm") as span:
+                span.set(prompt_tokens=12, completion_tokens=30, cache_hit=True)
+
+    trace = tracer.to_json()
+    writer, llm = trace["spans"]
+    assert llm["parent_id"] == writer["id"]
+    assert trace["totals"]["prompt_tokens"] == 12
+    assert trace["totals"]["cache_hits"] == 1
+    assert 'cmp_llm_tokens_total{kind="llm",name="llm",type="completion"}' in prometheus_snapshot()
+
+
+def test_client_registry_shares_sync_clients_and_scopes_async_ones_per_loop():
+    import asyncio
+    import subprocess
+    import sys
+    import threading
+
+    from tools import clients
+
+    clients.clear()
+    built = []
+
+    def factory():
+        built.append(object())
+        return built[-1]
+
+    assert clients.shared("k", factory) is clients.shared("k", factory)
+    assert len(built) == 1
+
+    async def in_loop():
+        return clients.shared_async("k", factory), clients.shared_async("k", factory)
+
+    a1, a2 = asyncio.run(in_loop())
+    b1, _ = asyncio.run(in_loop())
+    assert a1 is a2 and a1 is not b1
+    clients.clear()
+
+    # Building a client whose factory needs another shared client must not deadlock
+    from tools import TavilySearchTool
+
+    result = []
+    worker = threading.Thread(target=lambda: result.append(TavilySearchTool(cache=LLMCache(enabled=False))))
+    worker.start()
+    worker.join(timeout=10)
+    assert result, "TavilySearchTool() hung building its client"
+    assert TavilySearchTool(cache=LLMCache(enabled=False)).client is result[0].client
+    clients.clear()
+
+    code = "import sys, main; print(any(m in sys.modules for m in ('huggingface_hub', 'tavily', 'dotenv')))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_llm_router_adapts_max_tokens_within_route_ceiling(monkeypatch):
+    from tools import LLMRouter, Route
+
+    router = LLMRouter(routes={"researcher": Route(expected_tokens=400, max_tokens=800)}, min_samples=3)
+    # schema estimate until there is enough history
+    assert router.max_tokens("researcher") == 400
+    for tokens in (200, 220, 240):
+        router.record("researcher", tokens)
+    assert router.max_tokens("researcher") == 300  # p95 plus 25% headroom
+    for _ in range(10):
+        router.record("researcher", 1000)
+    assert router.max_tokens("researcher") == 800  # never above the ceiling
+    assert router.max_tokens("unknown-stage") == router.route(None).expected_tokens
+
+    monkeypatch.setenv("HF_MODEL_ID", "base-model")
+    monkeypatch.setenv("RESEARCH_MODEL", "small-model")
+    router = LLMRouter.from_env()
+    assert router.model("researcher") == "small-model"
+    assert router.model("planner") == "base-model"
+    with pytest.raises(ValueError):
+        Route(expected_tokens=900, max_tokens=800)
+
+
+def _fake_chat_server(handle):
+    """
+    Local OpenAI-style /v1/chat/completions endpoint. handle(n) returns
+    (status, headers) for request n, or (status, headers, stall) to pause
+    stall seconds halfway through the streamed reply.
+    """
+    import itertools
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    counter = itertools.count(1)
+
+    def chunk(content):
+        return b"data: " + json.dumps({
+            "id": "1", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": content}, "finish_reason": None}],
+        }).encode() + b"\n\n"
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            status, headers, *stall = handle(next(counter))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status != 200:
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": "slow down"}')
+                return
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            self.wfile.write(chunk('{"ok": '))
+            self.wfile.flush()
+            if stall:
+                time.sleep(stall[0])
+            try:
+                self.wfile.write(chunk("true}") + b"data: [DONE]\n\n")
+            except OSError:
+                pass  # the client gave up on this reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _complete(url):
+    from huggingface_hub import InferenceClient
+
+    client = InferenceClient(model=url)  # must outlive the stream
+    stream = client.chat_completion(messages=[{"role": "user", "content": "hi"}], stream=True, max_tokens=5)
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+
+
+def test_rate_limiter_honors_retry_after_and_records_retries():
+    pytest.importorskip("huggingface_hub")
+    from tools import RateLimiter, Tracer, prometheus_snapshot, trace_span
+    from tools.tracing import activate
+
+    server, url = _fake_chat_server(lambda n: (429, {"Retry-After": "1"}) if n == 1 else (200, {}))
+    limiter = RateLimiter("fake", max_concurrency=4)
+    try:
+        start = time.perf_counter()
+        with activate(Tracer()) as tracer:
+            with trace_span("llm", kind="llm") as span:
+                assert limiter.call(lambda: _complete(url), tokens=20, span=span) == '{"ok": true}'
+    finally:
+        server.shutdown()
+    assert time.perf_counter() - start >= 1.0
+    llm = tracer.to_json()["spans"][0]
+    assert llm["retries"] == 1 and llm["throttle_ms"] >= 1000
+    assert limiter.limit == 2.5  # halved on the 429, then +1/limit for the success
+    assert 'cmp_retries_total{kind="llm",name="llm"}' in prometheus_snapshot()
+
+
+def test_rate_limiter_adapts_concurrency_to_an_overloaded_server():
+    pytest.importorskip("huggingface_hub")
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from tools import RateLimiter, TokenBucket
+
+    lock, active = threading.Lock(), [0]
+
+    def handle(n):
+        # accepts two requests at a time and answers 503 beyond that
+        with lock:
+            if active[0] >= 2:
+                return 503, {}
+            active[0] += 1
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return 200, {}
+
+    server, url = _fake_chat_server(handle)
+    limiter = RateLimiter("fake", max_concurrency=8, backoff=0.02, max_retries=8, decrease_interval=0.05)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: limiter.call(lambda: _complete(url)), range(24)))
+    finally:
+        server.shutdown()
+    assert results == ['{"ok": true}'] * 24
+    assert limiter.limit < 8 and limiter.in_flight == 0
+
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 per second
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_hedged_call_takes_the_first_response_and_enforces_the_deadline():
+    import asyncio
+    import threading
+
+    from tools import LLMRouter, Route, Tracer, prometheus_snapshot, trace_span
+    from tools.hedging import DeadlineExceeded, ahedged_call, hedged_call
+    from tools.tracing import activate
+
+    cancelled = threading.Event()
+
+    def request(cancel, primary):
+        if primary:  # a stuck generation: only stops when cancelled
+            cancel.wait(5)
+            cancelled.set()
+            return "slow"
+        time.sleep(0.02)
+        return "fast"
+
+    start = time.perf_counter()
+    with activate(Tracer()) as tracer:
+        with trace_span("llm", kind="llm") as span:
+            assert hedged_call(request, hedge_after=0.05, span=span) == ("fast", True)
+    assert time.perf_counter() - start < 1 and cancelled.wait(1)
+    assert tracer.to_json()["spans"][0]["hedge_won"] is True
+    assert 'cmp_hedge_wins_total{kind="llm",name="llm"}' in prometheus_snapshot()
+
+    # a fast primary is never hedged
+    assert hedged_call(lambda cancel, primary: "quick", hedge_after=0.5) == ("quick", False)
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        hedged_call(lambda cancel, primary: cancel.wait(5), deadline=time.monotonic() + 0.05)
+    assert time.perf_counter() - start < 1
+
+    async def arequest(primary):
+        await asyncio.sleep(5 if primary else 0.02)
+        return "primary" if primary else "hedge"
+
+    async def run():
+        won = await ahedged_call(arequest, hedge_after=0.05)
+        with pytest.raises(DeadlineExceeded):
+            await ahedged_call(arequest, deadline=time.monotonic() + 0.05)
+        return won
+
+    assert asyncio.run(asyncio.wait_for(run(), 2)) == ("hedge", True)
+
+    router = LLMRouter(routes={"planner": Route(100, 200, hedge=True)}, min_samples=3)
+    for seconds in (1.0, 2.0, 3.0):
+        assert router.hedge_after("planner") is None
+        router.record("planner", 100, seconds)
+    assert router.hedge_after("planner") == 3.0
+    router.record("writer", 100, 1.0)
+    assert router.hedge_after("writer") is None  # hedging is off for the writer's route
+
+
+def test_deadline_and_hedge_cancel_requests_inside_the_rate_limiter(tmp_path):
+    pytest.importorskip("huggingface_hub")
+    import main
+    from tools import LLMCache, LLMRouter, Route, Tracer, clients
+    from tools.hedging import DeadlineExceeded
+    from tools.tracing import activate
+
+    requests = []
+
+    def throttled(n):
+        requests.append(n)
+        return 429, {"Retry-After": "1"}
+
+    server, url = _fake_chat_server(throttled)
+    clients.clear()  # a fresh shared "hf" limiter, so its pause doesn't leak into other tests
+    try:
+        router = LLMRouter(default_model=url, routes={None: Route(1400, 1400, deadline=0.5)})
+        call_llm = main.make_llm(cache=LLMCache(enabled=False), router=router)
+        start = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            call_llm("plan please")
+        # the Retry-After wait is cut short at the deadline and no retry is sent
+        assert time.perf_counter() - start < 0.9
+        assert requests == [1]
+    finally:
+        server.shutdown()
+        clients.clear()
+
+    # the losing request of a hedge is stuck mid-stream: its connection is
+    # shut down at once, so its limiter slot is free when the call returns
+    server, url = _fake_chat_server(lambda n: (200, {}, 5) if n == 1 else (200, {}))
+    clients.clear()
+    try:
+        router = LLMRouter(default_model=url, routes={None: Route(1400, 1400, hedge=True)}, min_samples=1)
+        router.record(None, 10, 0.05)
+        call_llm = main.make_llm(cache=LLMCache(enabled=False), router=router)
+        start = time.perf_counter()
+        with activate(Tracer()) as tracer:
+            assert call_llm("plan please") == {"ok": True}
+        assert tracer.to_json()["spans"][0]["hedge_won"] is True
+        limiter = clients.rate_limiter("hf")
+        for _ in range(50):
+            if limiter.in_flight == 0:
+                break
+            time.sleep(0.01)
+        assert limiter.in_flight == 0 and time.perf_counter() - start < 1.5
+    finally:
+        server.shutdown()
+        clients.clear()
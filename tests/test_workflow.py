@@ -0,0 +1,629 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from main import extract_json, run_campaign, run_campaign_async
+
+
+BRIEF = {
+    "topic": "AI tools for small businesses",
+    "product": "AI automation SaaS for SMEs",
+    "target_audience": "Owners of small service businesses",
+    "goals_kpis": "Increase trials by 30%; KPIs: trials, CTR",
+    "budget": "Low",
+    "preferred_channels": "LinkedIn, email",
+    "timeline_weeks": 4,
+    "constraints": "No jargon",
+    "additional_notes": "",
+}
+
+STRATEGY = {
+    "strategy_overview": {"summary": "Win SMB trials"},
+    "market_analysis": {"market_size": "large"},
+    "trend_adaptation": {"strategy": "short video"},
+    "messaging_positioning": {"messaging": "Save time"},
+    "execution_plan": [{"week_number": 1, "theme": "Launch"}],
+}
+
+RESEARCH = {
+    "market_analysis": {"market_size": "validated"},
+    "trend_adaptation": {"strategy": "validated"},
+    "validation_notes": ["Check pricing claims"],
+}
+
+ASSETS = {
+    "campaigns": [{"campaign_name": "Launch", "main_channel": "LinkedIn"}],
+    "posts": [
+        {"campaign_name": "Launch", "channel": "LinkedIn", "copy": "Hello", "cta": "Try it"},
+        {"campaign_name": "Launch", "channel": "email", "copy": "Hi", "cta": "Book a demo"},
+    ],
+}
+
+
+def canned_output(prompt: str):
+    if "marketing research validator" in prompt:
+        return RESEARCH
+    if "campaign designer" in prompt:
+        return {"campaigns": ASSETS["campaigns"]}
+    if "senior copywriter" in prompt:
+        return {"posts": ASSETS["posts"]}
+    return STRATEGY
+
+
+class FakeSearch:
+    def search(self, query: str) -> str:
+        return "snippets"
+
+
+class FakeAsyncSearch:
+    async def search(self, query: str) -> str:
+        return "snippets"
+
+
+def test_extract_json_ignores_braces_inside_strings():
+    text = 'Here you go:\n{"summary": "use {curly} braces", "n": 1}\nHope this helps {'
+    assert extract_json(text) == {"summary": "use {curly} braces", "n": 1}
+
+
+def test_run_campaign_with_injected_clients():
+    result = run_campaign(BRIEF, llm=canned_output, search_tool=FakeSearch())
+
+    assert result["strategy"]["market_analysis"] == {"market_size": "validated"}
+    assert result["strategy"]["validation_notes"] == ["Check pricing claims"]
+    assert result["campaigns"] == ASSETS["campaigns"]
+    assert len(result["posts"]) == 2
+    assert len(result["calendar"]) == 2
+    stages = [s["name"] for s in result["trace"]["spans"] if s["kind"] == "stage"]
+    assert set(stages) == {
+        "planner", "execution_plan", "search", "researcher", "writer", "metrics", "optimizer", "calendar"
+    }
+
+
+def test_run_campaign_async_overlaps_search_with_planner():
+    delay = 0.1
+
+    async def slow_llm(prompt: str):
+        await asyncio.sleep(delay)
+        return canned_output(prompt)
+
+    class SlowSearch:
+        async def search(self, query: str) -> str:
+            await asyncio.sleep(delay)
+            return "snippets"
+
+    start = time.perf_counter()
+    result = asyncio.run(run_campaign_async(BRIEF, llm=slow_llm, search_tool=SlowSearch()))
+    elapsed = time.perf_counter() - start
+
+    # planner || search, then researcher || (outline -> posts): three round trips, not five
+    assert elapsed < 4 * delay
+    assert result["strategy"]["validation_notes"] == ["Check pricing claims"]
+    assert len(result["calendar"]) == 2
+
+
+def test_run_batch_streams_results_and_resumes(tmp_path):
+    from batch import main as main_cli, run_batch
+
+    calls = []
+
+    async def fake_llm(prompt: str):
+        calls.append(prompt)
+        return canned_output(prompt)
+
+    class AsyncSearch:
+        async def search(self, query: str) -> str:
+            return "snippets"
+
+    briefs = tmp_path / "briefs.jsonl"
+    out = tmp_path / "results.jsonl"
+    briefs.write_text(
+        "\n".join(json.dumps({**BRIEF, "id": f"b{i}"}) for i in range(3)) + "\n"
+    )
+
+    summary = run_batch(str(briefs), str(out), concurrency=2, llm=fake_llm, search_tool=AsyncSearch())
+    assert summary == {"ok": 3, "failed": 0, "skipped": 0}
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(r["id"] for r in rows) == ["b0", "b1", "b2"]
+
+    calls.clear()
+    summary = run_batch(str(briefs), str(out), concurrency=2, llm=fake_llm, search_tool=AsyncSearch())
+    assert summary == {"ok": 0, "failed": 0, "skipped": 3}
+    assert calls == []
+
+    # a malformed line or a non-object only fails its own row
+    with briefs.open("a") as f:
+        f.write('{"topic": "broken\n[1, 2]\n' + json.dumps({**BRIEF, "id": "b3"}) + "\n")
+    summary = run_batch(str(briefs), str(out), concurrency=2, llm=fake_llm, search_tool=AsyncSearch())
+    assert summary == {"ok": 1, "failed": 2, "skipped": 3}
+    rows = {r["id"]: r for r in map(json.loads, out.read_text().splitlines())}
+    assert "JSONDecodeError" in rows["line-4"]["error"] and "list" in rows["line-5"]["error"]
+    assert "result" in rows["b3"]
+
+    with pytest.raises(ValueError):
+        run_batch(str(briefs), str(out), concurrency=0, llm=fake_llm, search_tool=AsyncSearch())
+    with pytest.raises(SystemExit):
+        main_cli([str(briefs), str(out), "--concurrency", "0"])
+
+
+def test_writer_drafts_posts_per_campaign_concurrently():
+    from agents import WriterAgent
+
+    campaigns = [{"campaign_name": f"C{i}"} for i in range(4)]
+
+    def slow_llm(prompt: str):
+        time.sleep(0.1)
+        if "campaign designer" in prompt:
+            return {"campaigns": campaigns}
+        name = next(c["campaign_name"] for c in campaigns if f'"{c["campaign_name"]}"' in prompt)
+        return {"posts": [{"channel": "LinkedIn", "copy": name}]}
+
+    start = time.perf_counter()
+    assets = WriterAgent(slow_llm).draft_and_review_assets({}, STRATEGY)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35  # outline + one concurrent round of post calls
+    assert assets["campaigns"] == campaigns
+    assert [p["campaign_name"] for p in assets["posts"]] == ["C0", "C1", "C2", "C3"]
+    assert [p["copy"] for p in assets["posts"]] == ["C0", "C1", "C2", "C3"]
+
+
+def test_iter_campaign_events_reports_planner_before_result():
+    from main import iter_campaign_events
+
+    async def fake_llm(prompt: str):
+        return canned_output(prompt)
+
+    class AsyncSearch:
+        async def search(self, query: str) -> str:
+            return "snippets"
+
+    events = list(iter_campaign_events(BRIEF, llm=fake_llm, search_tool=AsyncSearch()))
+    finished = [e["stage"] for e in events if e["type"] == "stage_finished"]
+
+    assert finished.index("planner") < finished.index("calendar")
+    assert events[-1]["type"] == "result"
+    assert events[-1]["data"]["strategy"]["validation_notes"] == ["Check pricing claims"]
+
+
+def test_iter_campaign_events_cancels_run_when_caller_stops():
+    import threading
+    from main import iter_campaign_events
+
+    calls = []
+
+    async def slow_llm(prompt: str):
+        calls.append(prompt)
+        await asyncio.sleep(0.2)
+        return canned_output(prompt)
+
+    class AsyncSearch:
+        async def search(self, query: str) -> str:
+            return "snippets"
+
+    events = iter_campaign_events(BRIEF, llm=slow_llm, search_tool=AsyncSearch())
+    assert next(events)["type"] == "stage_started"
+    events.close()
+
+    deadline = time.perf_counter() + 2
+    while any(t.name == "cmp-pipeline" for t in threading.enumerate()) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert not any(t.name == "cmp-pipeline" for t in threading.enumerate())
+    # the planner and execution-plan calls were cancelled; nothing downstream started
+    assert len(calls) == 2
+    assert all("content marketing planner" in p or "campaign scheduler" in p for p in calls)
+
+
+def test_iter_campaign_events_reuses_a_shared_background_loop():
+    from main import iter_campaign_events
+    from tools import clients
+
+    loops = set()
+
+    async def fake_llm(prompt: str):
+        loops.add(asyncio.get_running_loop())
+        return canned_output(prompt)
+
+    class AsyncSearch:
+        async def search(self, query: str) -> str:
+            return "snippets"
+
+    loop = clients.background_loop()
+    for _ in range(2):
+        events = list(iter_campaign_events(BRIEF, llm=fake_llm, search_tool=AsyncSearch(), loop=loop))
+        assert events[-1]["type"] == "result"
+    assert loops == {loop}
+
+
+def test_optimizer_reuses_metrics_and_keeps_top_k_per_channel():
+    from agents import OptimizerAgent
+
+    posts = [
+        {"channel": "LinkedIn", "copy": "a", "ctr": 3.0},
+        {"channel": "LinkedIn", "copy": "b", "ctr": 9.0},
+        {"channel": "linkedin ", "copy": "c", "ctr": 6.0},
+        {"channel": "email", "copy": "d", "ctr": 1.0},
+        {"channel": "email", "copy": "e", "ctr": 2.0},
+    ]
+    ranked, experiments = OptimizerAgent(top_k=2).optimize(posts, BRIEF, STRATEGY)
+
+    assert [p["copy"] for p in ranked] == ["b", "c", "e", "d"]
+    assert ranked[0] is posts[1]  # existing metrics reused, no copy
+    assert experiments
+
+
+def test_optimizer_kpi_scoring_follows_brief_goals():
+    from agents import OptimizerAgent
+    from agents.optimizer import kpi_weights
+
+    assert kpi_weights("Grow reach and awareness") == {"impressions": 1.0}
+
+    posts = [
+        {"copy": "high ctr", "ctr": 9.0, "clicks": 10, "impressions": 100},
+        {"copy": "high reach", "ctr": 1.0, "clicks": 50, "impressions": 5000},
+    ]
+    ranked, _ = OptimizerAgent(scoring="kpi").optimize(posts, {"goals_kpis": "Grow reach"}, STRATEGY)
+    assert ranked[0]["copy"] == "high reach"
+
+    unscored = [{"copy": "x"}, {"copy": "y"}]
+    ranked, _ = OptimizerAgent(scoring="thompson", seed=1).optimize(unscored, BRIEF, STRATEGY)
+    assert all("ctr" in p for p in ranked)
+
+
+def test_benchmark_fakes_drive_pipeline_and_compare_flags_regressions():
+    from benchmarks.fakes import FakeLLM, FakeSearchTool, LatencyModel
+    from benchmarks.run import compare
+
+    fast = LatencyModel(median_ms=1.0, seed=0)
+    llm = FakeLLM(fast)
+    result = run_campaign(BRIEF, llm=llm, search_tool=FakeSearchTool(fast))
+    assert result["campaigns"] and result["calendar"]
+    assert llm.calls >= 3
+
+    _, regressions = compare(
+        {"run_ms": 200.0, "tiny_ms": 0.5, "runs_per_s": 5.0},
+        {"run_ms": 100.0, "tiny_ms": 0.1, "runs_per_s": 10.0},
+        tolerance=0.25,
+    )
+    assert regressions == ["run_ms", "runs_per_s"]
+
+
+def test_stage_memo_reruns_only_stages_affected_by_a_brief_edit():
+    from pipeline import StageMemo
+
+    calls = []
+
+    def fake_llm(prompt: str):
+        calls.append(prompt)
+        return canned_output(prompt)
+
+    memo = StageMemo()
+    search = FakeSearch()
+    first = run_campaign(BRIEF, llm=fake_llm, search_tool=search, memo=memo)
+    llm_calls = len(calls)
+
+    # timeline_weeks only feeds the execution plan: the core strategy and research are reused
+    calls.clear()
+    events = []
+    longer = run_campaign(
+        {**BRIEF, "timeline_weeks": 8}, llm=fake_llm, search_tool=search, memo=memo, on_event=events.append
+    )
+    assert calls and not any("content marketing planner" in p or "research validator" in p for p in calls)
+    assert {p["copy"] for p in longer["posts"]} == {p["copy"] for p in first["posts"]}
+    memoized = {e["stage"] for e in events if e["type"] == "stage_finished" and e.get("memoized")}
+    assert memoized == {"planner", "search", "researcher"}
+
+    # constraints feed the planner and writer, and everything downstream of the planner
+    calls.clear()
+    run_campaign({**BRIEF, "constraints": "Plain English only"}, llm=fake_llm, search_tool=search, memo=memo)
+    assert len(calls) == llm_calls
+
+
+def test_failed_run_resumes_from_checkpointed_stages(tmp_path):
+    from main import resume_campaign
+    from resume import finished_stages
+    from tools import CheckpointStore
+
+    store = CheckpointStore(path=str(tmp_path / "checkpoints.sqlite"))
+    calls = []
+
+    def flaky_llm(prompt: str):
+        calls.append(prompt)
+        if "senior campaign designer" in prompt:
+            raise ValueError("No complete JSON object found in model output")
+        return canned_output(prompt)
+
+    with pytest.raises(ValueError) as excinfo:
+        run_campaign(BRIEF, llm=flaky_llm, search_tool=FakeSearch(), checkpoints=store, run_id="r1")
+    assert "resume_campaign('r1')" in "".join(excinfo.value.__notes__)
+    assert store.runs()[0]["status"] == "failed"
+    assert set(finished_stages(store, "r1")) >= {"planner", "search"}
+
+    calls.clear()
+
+    def fixed_llm(prompt: str):
+        calls.append(prompt)
+        return canned_output(prompt)
+
+    result = resume_campaign("r1", llm=fixed_llm, search_tool=FakeSearch(), checkpoints=store)
+    assert result["run_id"] == "r1" and result["calendar"]
+    # planner and researcher outputs came from the checkpoint, not new LLM calls
+    assert not any("content marketing planner" in p or "research validator" in p for p in calls)
+    assert store.runs()[0]["status"] == "done"
+
+    with pytest.raises(ValueError):
+        run_campaign({**BRIEF, "topic": "other"}, llm=fixed_llm, checkpoints=store, run_id="r1")
+
+
+def test_truncated_stream_is_continued_then_repaired(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    import main
+    from tools import LLMCache, Tracer
+    from tools.tracing import activate
+
+    def chunks(text, size=7):
+        return iter(
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + size]))])
+            for i in range(0, len(text), size)
+        )
+
+    full = json.dumps({"summary": "Win SMB trials", "execution_plan": [{"week": 1}, {"week": 2}]})
+    cut = full.index('{"week": 2}') + 5
+    replies = []
+
+    class FakeClient:
+        def __init__(self):
+            self.requests = []
+
+        def chat_completion(self, messages, **kwargs):
+            self.requests.append((messages, kwargs))
+            return chunks(replies.pop(0))
+
+    client = FakeClient()
+    monkeypatch.setattr(main.clients, "inference_client", lambda model_id, token, timeout=None: client)
+    call_llm = main.make_llm(cache=LLMCache(path=str(tmp_path / "llm.sqlite")))
+
+    # The continuation repeats the tail and wraps it in a fence; both are stripped
+    replies[:] = [full[:cut], "```json\n" + full[cut - 10:] + "\n```"]
+    with activate(Tracer()) as tracer:
+        assert call_llm("plan please") == json.loads(full)
+    span = tracer.to_json()["spans"][0]
+    assert span["truncated"] and span["recovery"] == "continuation"
+    messages, kwargs = client.requests[1]
+    assert messages[-2] == {"role": "assistant", "content": full[:cut]}
+    assert client.requests[0][1]["max_tokens"] == call_llm.router.max_tokens(None)
+    # the continuation falls back to the route's full budget
+    assert kwargs["max_tokens"] == call_llm.router.route(None).max_tokens
+    assert call_llm("plan please") == json.loads(full)  # complete result was cached
+
+    # Continuations that never close the object fall back to a local repair (not cached)
+    replies[:] = [full[:cut]] + [""] * main.MAX_CONTINUATIONS
+    assert call_llm("plan again") == {"summary": "Win SMB trials", "execution_plan": [{"week": 1}]}
+    assert call_llm.cache.get(
+        LLMCache.make_key(call_llm.router.model(None), main.SYSTEM_PROMPT, "plan again", {"temperature": 0.4})
+    ) is None
+
+
+def test_campaign_plan_models_normalize_loose_llm_output():
+    from models import CampaignPlan, Strategy
+
+    strategy = Strategy.model_validate({
+        "strategy_overview": "Lead with time savings",
+        "target_audience": {"segment": "Agency owners", "painpoints": "['admin', 'billing']"},
+        "customer_journey": {"Awareness": {"key_messages": ["Save hours"]}, "Decision": "Free trial"},
+        "objectives_kpis": [{"objective": "More trials"}, "Lower CAC"],
+        "budget_plan": {"budget": 5000, "breakdown": [{"channel": "LinkedIn", "cost": "60%"}]},
+        "analytics_feedback": "Weekly dashboard review",
+    })
+    assert strategy.strategy_overview.summary == "Lead with time savings"
+    assert strategy.target_audience.description == "Agency owners"
+    assert strategy.target_audience.pain_points == ["admin", "billing"]
+    assert [s.stage for s in strategy.customer_journey] == ["Awareness", "Decision"]
+    assert strategy.customer_journey[1].description == "Free trial"
+    assert strategy.objectives_kpis.items == ["More trials", "Lower CAC"]
+    assert strategy.budget_plan.total_budget == "5000"
+    assert (strategy.budget_plan.allocation[0].label, strategy.budget_plan.allocation[0].amount) == ("LinkedIn", "60%")
+    assert strategy.analytics_feedback.description == "Weekly dashboard review"
+
+    result = run_campaign(BRIEF, llm=canned_output, search_tool=FakeSearch())
+    plan = CampaignPlan.from_result(result)
+    assert plan.strategy.validation_notes == ["Check pricing claims"]
+    assert len(plan.posts) == 2 and not hasattr(plan.posts[0], "__dict__")
+    assert plan.calendar[0].date.isoformat() == result["calendar"][0]["date"]
+    # straight from raw JSON text, without an intermediate dict
+    assert CampaignPlan.model_validate_json(json.dumps(result, default=str)) == plan
+
+
+def test_execution_plan_is_planned_in_concurrent_week_blocks():
+    blocks = []
+
+    def fake_llm(prompt: str):
+        if "content marketing planner" in prompt:
+            time.sleep(0.05)
+        if "campaign scheduler" not in prompt:
+            return canned_output(prompt)
+        assert "of a 9-week campaign" in prompt
+        first, last = (int(w) for w in prompt.split("execution plan for weeks ", 1)[1].split(" of", 1)[0].split(" to "))
+        blocks.append((first, last))
+        time.sleep(0.05)
+        # out-of-range and unnumbered weeks, as models sometimes return
+        weeks = [{"week_number": w, "theme": f"Week {w}"} for w in range(first, last + 2)]
+        return {"execution_plan": [{"theme": "unnumbered"}] if first == 9 else list(reversed(weeks))}
+
+    start = time.perf_counter()
+    result = run_campaign({**BRIEF, "timeline_weeks": 9}, llm=fake_llm, search_tool=FakeSearch())
+    elapsed = time.perf_counter() - start
+
+    assert sorted(blocks) == [(1, 4), (5, 8), (9, 9)]
+    # the core strategy and every block of weeks run at once, even from the sync run_campaign()
+    assert elapsed < 2 * 0.05
+    plan = result["strategy"]["execution_plan"]
+    assert [w["week_number"] for w in plan] == list(range(1, 10))
+    assert plan[8]["theme"] == "unnumbered"
+
+
+def _streaming_planner_llm(final_strategy, tail_delay):
+    """Async fake that streams STRATEGY's fields, then returns final_strategy after tail_delay."""
+    from pipeline import field_sink
+
+    async def llm(prompt: str, on_field=None):
+        on_field = on_field or field_sink()
+        if "content marketing planner" not in prompt:
+            return canned_output(prompt)
+        for key, value in STRATEGY.items():
+            if on_field is not None:
+                on_field(key, value)
+            await asyncio.sleep(0)
+        await asyncio.sleep(tail_delay)
+        return final_strategy
+
+    return llm
+
+
+def test_researcher_and_writer_start_from_streamed_planner_fields():
+    events = []
+    llm = _streaming_planner_llm(STRATEGY, tail_delay=0.2)
+    result = asyncio.run(run_campaign_async(BRIEF, llm=llm, search_tool=FakeAsyncSearch(), on_event=events.append))
+
+    planner_done = next(i for i, e in enumerate(events) if e["type"] == "stage_finished" and e["stage"] == "planner")
+    for stage in ("researcher", "writer"):
+        started = [i for i, e in enumerate(events) if e["type"] == "stage_started" and e["stage"] == stage]
+        assert len(started) == 1 and started[0] < planner_done
+        assert events[started[0]].get("speculative")
+    assert result["strategy"]["validation_notes"] == ["Check pricing claims"]
+    assert result["strategy"]["strategy_overview"] == STRATEGY["strategy_overview"]
+
+
+def test_speculative_stage_reruns_when_planner_output_changes():
+    events, prompts = [], []
+    corrected = {**STRATEGY, "market_analysis": {"market_size": "corrected"}}
+    planner_llm = _streaming_planner_llm(corrected, tail_delay=0.05)
+
+    async def llm(prompt: str, on_field=None):
+        prompts.append(prompt)
+        return await planner_llm(prompt, on_field=on_field)
+
+    asyncio.run(run_campaign_async(BRIEF, llm=llm, search_tool=FakeAsyncSearch(), on_event=events.append))
+
+    started = [e for e in events if e["type"] == "stage_started" and e["stage"] == "researcher"]
+    assert [bool(e.get("speculative")) for e in started] == [True, False]
+    research_prompts = [p for p in prompts if "research validator" in p]
+    assert "corrected" in research_prompts[-1]
+    # the writer's field didn't change, so its speculative run was kept
+    assert len([e for e in events if e["type"] == "stage_started" and e["stage"] == "writer"]) == 1
+
+
+def test_make_llm_routes_model_and_budget_by_stage(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    import main
+    from tools import LLMCache, LLMRouter, Route
+
+    requests = []
+
+    class FakeClient:
+        def __init__(self, model_id):
+            self.model_id = model_id
+
+        def chat_completion(self, messages, **kwargs):
+            prompt = messages[-1]["content"]
+            requests.append((prompt, self.model_id, kwargs["max_tokens"], kwargs["temperature"]))
+            text = json.dumps(canned_output(prompt))
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])])
+
+    monkeypatch.setattr(main.clients, "inference_client", lambda model_id, token, timeout=None: FakeClient(model_id))
+    router = LLMRouter(
+        default_model="big-model",
+        routes={"researcher": Route(expected_tokens=300, max_tokens=600, temperature=0.1, model="small-model")},
+    )
+    llm = main.make_llm(cache=LLMCache(path=str(tmp_path / "llm.sqlite")), router=router)
+    run_campaign(BRIEF, llm=llm, search_tool=FakeSearch())
+
+    research = [r for r in requests if "research validator" in r[0]]
+    assert [r[1:] for r in research] == [("small-model", 300, 0.1)]
+    planner = [r for r in requests if "content marketing planner" in r[0]]
+    assert planner[0][1:3] == ("big-model", router.route("planner").expected_tokens)
+
+
+def test_make_llm_hedges_slow_calls_and_streams_the_winner(tmp_path, monkeypatch):
+    import time
+    from types import SimpleNamespace
+
+    import main
+    from tools import LLMCache, LLMRouter, Route, Tracer
+    from tools.tracing import activate
+
+    reply = json.dumps({"summary": "Win SMB trials", "channels": ["LinkedIn"]})
+    calls = []
+
+    def chunks(delay):
+        for i in range(0, len(reply), 8):
+            time.sleep(delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=reply[i:i + 8]))])
+
+    class FakeClient:
+        def chat_completion(self, messages, **kwargs):
+            calls.append(kwargs)
+            # the first request is a stuck generation, the duplicate is quick
+            return chunks(0.3 if len(calls) == 1 else 0)
+
+    monkeypatch.setattr(main.clients, "inference_client", lambda model_id, token, timeout=None: FakeClient())
+    router = LLMRouter(routes={None: Route(1400, 1400, hedge=True)}, min_samples=3)
+    for _ in range(3):
+        router.record(None, 100, 0.05)  # p95 latency so far: 50ms
+    call_llm = main.make_llm(cache=LLMCache(path=str(tmp_path / "llm.sqlite")), router=router)
+
+    fields = []
+    start = time.perf_counter()
+    with activate(Tracer()) as tracer:
+        assert call_llm("plan please", on_field=lambda k, v: fields.append(k)) == json.loads(reply)
+    assert time.perf_counter() - start < 0.6  # the stuck stream takes 0.3s per chunk
+    assert len(calls) == 2
+    span = tracer.to_json()["spans"][0]
+    assert span["hedged"] and span["hedge_won"]
+    assert fields == ["summary", "channels"]  # replayed from the winner, none from the loser
+
+    # without hedging, a request past the route's deadline is abandoned
+    calls.clear()
+    call_llm = main.make_llm(
+        cache=LLMCache(enabled=False), router=LLMRouter(routes={None: Route(1400, 1400, deadline=0.1)})
+    )
+    with pytest.raises(TimeoutError):
+        call_llm("plan please")
+
+
+def test_repaired_llm_reply_is_kept_out_of_the_stage_memo(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    import main
+    from pipeline import StageMemo
+    from tools import LLMCache
+
+    def reply(text):
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])])
+
+    class FakeClient:
+        def chat_completion(self, messages, **kwargs):
+            prompt = messages[-1]["content"]
+            if "cut off" in prompt:
+                return reply("")  # the continuation adds nothing: fall back to a local repair
+            text = json.dumps(canned_output(prompt))
+            if "content marketing planner" in prompt:
+                text = text[: text.index('"messaging_positioning"') + 30]
+            return reply(text)
+
+    monkeypatch.setattr(main.clients, "inference_client", lambda model_id, token, timeout=None: FakeClient())
+    llm = main.make_llm(cache=LLMCache(path=str(tmp_path / "llm.sqlite")))
+    memo = StageMemo()
+    events = []
+    result = run_campaign(BRIEF, llm=llm, search_tool=FakeSearch(), memo=memo, on_event=events.append)
+    # the repaired strategy (without the cut-off section) is still used for this run
+    assert result["strategy"]["strategy_overview"] == {"summary": "Win SMB trials"}
+
+    graph = main.build_campaign_graph(None, None)
+    keys = graph.stage_keys(BRIEF)
+    stored = {name for name, key in keys.items() if memo.get(key) is not None}
+    # the planner and everything downstream of it run again next time
+    assert stored == {"execution_plan", "search"}
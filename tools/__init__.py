@@ -1,4 +1,11 @@
-from .tavily_search import TavilySearchTool
+from .tavily_search import TavilySearchTool, AsyncTavilySearchTool
 from .calendar import CalendarTool
 from .metrics_sim import MetricsSimulator
 from .hf_analyzer import HFAnalyzer
+from .llm_cache import LLMCache
+from .llm_router import LLMRouter, Route
+from .checkpoints import CheckpointStore
+from .rate_limit import RateLimiter, TokenBucket
+from .json_stream import JSONStreamParser
+from .prompt_builder import PromptBuilder, count_tokens
+from .tracing import Tracer, trace_span, prometheus_snapshot
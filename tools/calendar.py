@@ -1,13 +1,137 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
 from datetime import date, timedelta
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Max posts per channel per week when no cadence is given for it
+DEFAULT_CADENCE = {
+    "linkedin": 3,
+    "email": 1,
+    "newsletter": 1,
+    "blog": 1,
+    "youtube": 3,
+    "instagram": 4,
+    "facebook": 3,
+    "tiktok": 5,
+    "twitter": 5,
+    "x": 5,
+}
+
 
 class CalendarTool:
-    def build_calendar(self, posts: List[Dict], start_date: date | None = None) -> List[Dict]:
+    """
+    Greedy slot scheduler for posts.
+
+    Posts are placed in the order given (best-ranked first), each on the
+    earliest day that satisfies every rule:
+    - inside the timeline window (start_date + timeline_weeks) when given,
+    - not a blackout date,
+    - at most one post per channel per day and `cadence` posts per channel
+      per week (weeks counted from start_date),
+    - at least campaign_gap_days between two posts of the same campaign.
+
+    Per-channel "first open day" pointers and per-campaign sorted day lists
+    keep each placement close to O(log n), so thousands of posts across many
+    campaigns schedule quickly. Posts that don't fit are returned separately.
+    """
+
+    def __init__(
+        self,
+        cadence: Optional[Dict[str, int]] = None,
+        default_cadence: int = 3,
+        campaign_gap_days: int = 2,
+        blackout_dates: Iterable[date] = (),
+        horizon_days: int = 365,
+    ):
+        self.cadence = {k.lower(): v for k, v in {**DEFAULT_CADENCE, **(cadence or {})}.items()}
+        self.default_cadence = default_cadence
+        self.campaign_gap_days = campaign_gap_days
+        self.blackout_dates = set(blackout_dates)
+        self.horizon_days = horizon_days
+
+    def channel_cadence(self, channel: str) -> int:
+        name = " ".join(str(channel or "").lower().split())
+        if name in self.cadence:
+            return self.cadence[name]
+        for word in name.replace("/", " ").split():
+            if word in self.cadence:
+                return self.cadence[word]
+        return self.default_cadence
+
+    def schedule(
+        self,
+        posts: List[Dict],
+        start_date: date | None = None,
+        timeline_weeks: Optional[int] = None,
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Return (scheduled posts with a "date", posts that didn't fit)."""
         if start_date is None:
             start_date = date.today()
-        scheduled = []
-        day = start_date
-        for p in posts:
-            scheduled.append({**p, "date": day.isoformat()})
-            day += timedelta(days=2)
+        window = int(timeline_weeks) * 7 if timeline_weeks else self.horizon_days
+        blocked = {(d - start_date).days for d in self.blackout_dates}
+
+        used_days = defaultdict(set)       # channel -> day offsets taken
+        week_counts = defaultdict(int)     # (channel, week) -> posts
+        first_open = defaultdict(int)      # channel -> no free day before this
+        campaign_days = defaultdict(list)  # campaign -> sorted day offsets
+        gap = self.campaign_gap_days
+
+        placed: List[Tuple[int, int, Dict]] = []
+        unscheduled: List[Dict] = []
+
+        for rank, p in enumerate(posts):
+            channel = " ".join(str(p.get("channel", "")).lower().split())
+            campaign = p.get("campaign_name")
+            cap = self.channel_cadence(channel)
+            days = campaign_days[campaign] if campaign else []
+
+            day = first_open[channel]
+            slot = None
+            while day < window:
+                week = day // 7
+                if week_counts[(channel, week)] >= cap:
+                    day = (week + 1) * 7
+                    continue
+                if day in blocked or day in used_days[channel]:
+                    day += 1
+                    continue
+                if days and gap > 0:
+                    i = bisect_left(days, day)
+                    if i < len(days) and days[i] - day < gap:
+                        day = days[i] + gap
+                        continue
+                    if i > 0 and day - days[i - 1] < gap:
+                        day = days[i - 1] + gap
+                        continue
+                slot = day
+                break
+
+            if slot is None:
+                unscheduled.append(p)
+                continue
+
+            used_days[channel].add(slot)
+            week_counts[(channel, slot // 7)] += 1
+            if campaign:
+                insort(days, slot)
+            # Advance the channel pointer past days that are now unusable
+            d = first_open[channel]
+            while d < window and (
+                d in used_days[channel] or d in blocked or week_counts[(channel, d // 7)] >= cap
+            ):
+                d += 1
+            first_open[channel] = d
+            placed.append((slot, rank, p))
+
+        placed.sort(key=lambda t: (t[0], t[1]))
+        scheduled = [{**p, "date": (start_date + timedelta(days=slot)).isoformat()} for slot, _, p in placed]
+        return scheduled, unscheduled
+
+    def build_calendar(
+        self,
+        posts: List[Dict],
+        start_date: date | None = None,
+        timeline_weeks: Optional[int] = None,
+    ) -> List[Dict]:
+        scheduled, _ = self.schedule(posts, start_date=start_date, timeline_weeks=timeline_weeks)
         return scheduled
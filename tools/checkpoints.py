@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+
+class _RunMemo:
+    """Memo view of one run's checkpoints, in the get/set shape StageGraph expects."""
+
+    def __init__(self, store: "CheckpointStore", run_id: str):
+        self.store = store
+        self.run_id = run_id
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.store.get(self.run_id, key)
+
+    def set(self, key: str, value: Any) -> None:
+        self.store.set(self.run_id, key, value)
+
+
+class CheckpointStore:
+    """
+    On-disk store of pipeline stage outputs, per run.
+
+    Each run is recorded with its brief (and the brief's hash) and a status
+    (running / failed / done); each finished stage is saved under the run id
+    and its StageGraph key as soon as it completes. Resuming a run replays
+    the saved stages and only executes the ones that never finished, so a
+    failed writer call doesn't cost the planner and researcher calls again.
+
+    Runs older than ttl_seconds are purged when a new run starts.
+    """
+
+    def __init__(self, path: str = ".cmp_cache/checkpoints.sqlite", ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, brief_hash TEXT NOT NULL, brief TEXT NOT NULL, "
+                "status TEXT NOT NULL, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                "run_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (run_id, key))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def start(self, brief: Dict[str, Any], brief_hash: str, run_id: Optional[str] = None) -> str:
+        """Record a new run (or mark an existing one as running again) and return its id."""
+        run_id = run_id or uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT brief_hash FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is not None and row[0] != brief_hash:
+                raise ValueError(f"Run '{run_id}' was started with a different brief")
+            if row is None:
+                if self.ttl_seconds is not None:
+                    self._purge(db, now - self.ttl_seconds)
+                db.execute(
+                    "INSERT INTO runs (run_id, brief_hash, brief, status, created, updated) "
+                    "VALUES (?, ?, ?, 'running', ?, ?)",
+                    (run_id, brief_hash, json.dumps(brief, ensure_ascii=False, default=str), now, now),
+                )
+            else:
+                db.execute(
+                    "UPDATE runs SET status = 'running', error = NULL, updated = ? WHERE run_id = ?",
+                    (now, run_id),
+                )
+            db.commit()
+        return run_id
+
+    def finish(self, run_id: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "UPDATE runs SET status = ?, error = ?, updated = ? WHERE run_id = ?",
+                ("failed" if error else "done", error, time.time(), run_id),
+            )
+            db.commit()
+
+    def get(self, run_id: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT value FROM stages WHERE run_id = ? AND key = ?", (run_id, key)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, run_id: str, key: str, value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO stages (run_id, key, value, created) VALUES (?, ?, ?, ?)",
+                (run_id, key, data, time.time()),
+            )
+            db.execute("UPDATE runs SET updated = ? WHERE run_id = ?", (time.time(), run_id))
+            db.commit()
+
+    def memo(self, run_id: str) -> _RunMemo:
+        return _RunMemo(self, run_id)
+
+    def brief(self, run_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db().execute("SELECT brief FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown run '{run_id}'")
+        return json.loads(row[0])
+
+    def keys(self, run_id: str) -> set:
+        """StageGraph keys of the stages this run has finished."""
+        with self._lock:
+            rows = self._db().execute("SELECT key FROM stages WHERE run_id = ?", (run_id,)).fetchall()
+        return {r[0] for r in rows}
+
+    def runs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded runs, most recently updated first."""
+        query = (
+            "SELECT r.run_id, r.brief_hash, r.status, r.error, r.updated, COUNT(s.key) "
+            "FROM runs r LEFT JOIN stages s ON s.run_id = r.run_id"
+        )
+        params: tuple = ()
+        if status is not None:
+            query += " WHERE r.status = ?"
+            params = (status,)
+        query += " GROUP BY r.run_id ORDER BY r.updated DESC"
+        with self._lock:
+            rows = self._db().execute(query, params).fetchall()
+        return [
+            {"run_id": r[0], "brief_hash": r[1], "status": r[2], "error": r[3], "updated": r[4], "stages": r[5]}
+            for r in rows
+        ]
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM stages WHERE run_id = ?", (run_id,))
+            db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            db.commit()
+
+    def _purge(self, db: sqlite3.Connection, cutoff: float) -> None:
+        db.execute("DELETE FROM stages WHERE run_id IN (SELECT run_id FROM runs WHERE updated < ?)", (cutoff,))
+        db.execute("DELETE FROM runs WHERE updated < ?", (cutoff,))
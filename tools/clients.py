@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable
+
+_lock = threading.RLock()  # factories may request other shared clients
+_clients: Dict[Hashable, Any] = {}
+# Async clients own connection pools bound to the loop that created them
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+_env_loaded = False
+
+
+def load_env() -> None:
+    """Load .env into os.environ once per process, on first use rather than at import."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def shared(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """Return the process-wide object for key, building it with factory on first use."""
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def shared_async(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Like shared(), but scoped to the running event loop: async HTTP clients
+    can't be reused across loops, so each loop (e.g. each asyncio.run) gets
+    its own, dropped when the loop is garbage-collected. Outside a running
+    loop a fresh, unshared client is returned.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return factory()
+    with _lock:
+        per_loop = _loop_clients.setdefault(loop, {})
+        client = per_loop.get(key)
+        if client is None:
+            client = per_loop[key] = factory()
+    return client
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """
+    A process-wide event loop running in a daemon thread. Runs submitted to
+    it share its per-loop async clients, so long-lived hosts (the Streamlit
+    app) keep their connections warm between runs.
+    """
+    def build():
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="cmp-loop", daemon=True).start()
+        return loop
+
+    return shared("background_loop", build)
+
+
+def rate_limiter(provider: str):
+    """The process-wide RateLimiter for provider ("hf", "tavily"), configured from the environment."""
+    def build():
+        from .rate_limit import RateLimiter
+
+        load_env()
+        return RateLimiter.from_env(provider, max_concurrency=8 if provider == "hf" else 4)
+
+    return shared(("RateLimiter", provider), build)
+
+
+def clear() -> None:
+    """Forget every cached client (e.g. after rotating API keys, or in tests)."""
+    with _lock:
+        _clients.clear()
+        _loop_clients.clear()
+
+
+def http_session():
+    """One keep-alive requests.Session for every sync HTTP client in the process."""
+    def build():
+        import requests
+
+        return requests.Session()
+
+    return shared("requests.Session", build)
+
+
+def inference_client(model_id: str, token: str | None, timeout: float | None = None):
+    def build():
+        from huggingface_hub import InferenceClient
+
+        return InferenceClient(model=model_id, token=token, timeout=timeout)
+
+    return shared(("InferenceClient", model_id, token, timeout), build)
+
+
+def async_inference_client(model_id: str, token: str | None, timeout: float | None = None):
+    def build():
+        from huggingface_hub import AsyncInferenceClient
+
+        return AsyncInferenceClient(model=model_id, token=token, timeout=timeout)
+
+    return shared_async(("AsyncInferenceClient", model_id, token, timeout), build)
+
+
+def tavily_client(api_key: str | None):
+    def build():
+        from tavily import TavilyClient
+
+        return TavilyClient(api_key=api_key, session=http_session())
+
+    return shared(("TavilyClient", api_key), build)
+
+
+def async_tavily_client(api_key: str | None):
+    def build():
+        from tavily import AsyncTavilyClient
+
+        return AsyncTavilyClient(api_key=api_key)
+
+    return shared_async(("AsyncTavilyClient", api_key), build)
@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from . import clients
+
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM request ran past its stage's deadline and was abandoned."""
+
+
+class Cancellation:
+    """
+    Cancel signal for one sync request. Works like a threading.Event, and
+    set() also runs the callbacks registered with on_set(), e.g. one that
+    aborts the request's HTTP stream so a blocked read returns at once.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def set(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # best effort: the request also checks is_set() itself
+
+    def on_set(self, callback: Callable[[], None]) -> None:
+        """Run callback on set(), or right away if already set."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+def abort_stream(chunks, depth: int = 4) -> None:
+    """
+    Shut down the socket under a streamed chat_completion (called from
+    another thread). Closing the response alone doesn't wake a read that is
+    blocked waiting for the next chunk; shutting the socket down does.
+    """
+    frame = getattr(chunks, "gi_frame", None)
+    if frame is None or depth == 0:
+        return
+    for value in list(frame.f_locals.values()):
+        stream = getattr(value, "extensions", {}).get("network_stream") if hasattr(value, "extensions") else None
+        if stream is not None:
+            sock = stream.get_extra_info("socket")
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            value.close()
+            return
+        if hasattr(value, "gi_frame"):
+            abort_stream(value, depth - 1)
+
+
+def _pool() -> ThreadPoolExecutor:
+    return clients.shared("hedge_pool", lambda: ThreadPoolExecutor(max_workers=32, thread_name_prefix="cmp-hedge"))
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def hedged_call(
+    request: Callable[[Cancellation, bool], Any],
+    hedge_after: Optional[float] = None,
+    deadline: Optional[float] = None,
+    span=None,
+) -> Tuple[Any, bool]:
+    """
+    Run request(cancel, primary) and, if it hasn't returned hedge_after
+    seconds in, a duplicate request(cancel, False). The first to succeed
+    wins and the other is cancelled: request should pass cancel on to
+    RateLimiter.call() and register abort_stream() for its stream with
+    cancel.on_set(). deadline is a time.monotonic() value past which both
+    are cancelled and DeadlineExceeded is raised.
+
+    Returns (result, hedge_won). Without hedge_after the request runs inline.
+    """
+    if hedge_after is None:
+        cancel = Cancellation()
+        timer = threading.Timer(_remaining(deadline), cancel.set) if deadline is not None else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        try:
+            result = request(cancel, True)
+        except (Exception, CancelledError) as e:
+            if cancel.is_set():
+                raise _expired(span) from e
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if cancel.is_set():
+            raise _expired(span)
+        return result, False
+
+    pool = _pool()
+    cancels = {}
+
+    def submit(primary: bool):
+        cancel = Cancellation()
+        future = pool.submit(contextvars.copy_context().run, request, cancel, primary)
+        cancels[future] = cancel
+        return future
+
+    primary = submit(True)
+    pending = {primary}
+    first_error = None
+    while pending:
+        if len(cancels) == 1:
+            timeout = hedge_after if deadline is None else min(hedge_after, _remaining(deadline))
+        else:
+            timeout = _remaining(deadline)
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    cancels[other].set()
+                hedge_won = future is not primary
+                if span is not None and len(cancels) > 1:
+                    span.set(hedged=True, hedge_won=hedge_won)
+                return future.result(), hedge_won
+            first_error = first_error or future.exception()
+        if not done and len(cancels) == 1 and (deadline is None or time.monotonic() < deadline):
+            pending.add(submit(False))  # the primary is slower than the stage's p95: hedge it
+        elif not done:
+            for future in pending:
+                cancels[future].set()
+            raise _expired(span)
+    if span is not None and len(cancels) > 1:
+        span.set(hedged=True, hedge_won=False)
+    raise first_error
+
+
+async def ahedged_call(
+    request: Callable[[bool], Awaitable[Any]],
+    hedge_after: Optional[float] = None,
+    deadline: Optional[float] = None,
+    span=None,
+) -> Tuple[Any, bool]:
+    """Async counterpart of hedged_call(); the losing request's task is cancelled."""
+    if hedge_after is None:
+        try:
+            return await asyncio.wait_for(request(True), _remaining(deadline)), False
+        except asyncio.TimeoutError:
+            raise _expired(span) from None
+
+    primary = asyncio.ensure_future(request(True))
+    tasks = [primary]
+    pending = {primary}
+    first_error = None
+    try:
+        while pending:
+            if len(tasks) == 1:
+                timeout = hedge_after if deadline is None else min(hedge_after, _remaining(deadline))
+            else:
+                timeout = _remaining(deadline)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    hedge_won = task is not primary
+                    if span is not None and len(tasks) > 1:
+                        span.set(hedged=True, hedge_won=hedge_won)
+                    return task.result(), hedge_won
+                first_error = first_error or task.exception()
+            if not done and len(tasks) == 1 and (deadline is None or time.monotonic() < deadline):
+                tasks.append(asyncio.ensure_future(request(False)))
+                pending.add(tasks[-1])
+            elif not done:
+                raise _expired(span)
+        if span is not None and len(tasks) > 1:
+            span.set(hedged=True, hedge_won=False)
+        raise first_error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _expired(span) -> DeadlineExceeded:
+    if span is not None:
+        span.set(deadline_exceeded=True)
+    return DeadlineExceeded("LLM request exceeded its stage deadline")
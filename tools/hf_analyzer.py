@@ -1,7 +1,143 @@
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+# Phrase boundaries for RAKE-style candidates: punctuation and line breaks
+_BOUNDARY = re.compile(r"[.,;:!?()\[\]{}\"“”\n\r\t|/]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+get got had has have having he her here hers him his how i if in into is it its itself just
+let me more most my no nor not now of off on once only or other our ours out over own same
+she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself
+""".split())
+
+POSITIVE = frozenset("""
+amazing awesome benefit benefits best better boost boosts clear confident easy effective
+efficient effortless empower enjoy excellent exciting fast faster free gain gains great grow
+growth happy helpful improve improved improves love loved powerful proven reliable save saves
+saving secure simple simplify smart smooth success successful support trusted valuable win wins
+""".split())
+
+NEGATIVE = frozenset("""
+annoying bad broken complex complicated confusing costly difficult expensive fail failed
+failing failure frustrating hard hate lose losing loss manual messy overwhelmed overwhelming
+pain painful poor problem problems risk risky slow stress stressful struggle tedious waste
+wasted worse worst wrong
+""".split())
+
+NEGATIONS = frozenset({"not", "no", "never", "without", "don't", "doesn't", "isn't", "can't", "won't"})
+
+
 class HFAnalyzer:
-    # Placeholder for future Hugging Face sentiment / topic analysis
-    def analyze_sentiment(self, text: str) -> str:
+    """
+    Offline text analysis for batches of post copy.
+
+    - Sentiment: lexicon scoring with simple negation handling, returning a
+      score in [-1, 1] and a positive / negative / neutral label.
+    - Keywords: RAKE-style candidate phrases (runs of non-stopwords) ranked
+      by TF-IDF computed across the batch.
+
+    Per-text work (tokenizing, phrase extraction, sentiment) is memoized by a
+    hash of the text, so re-analyzing the same copy is free; only the IDF
+    weighting is recomputed per batch.
+    """
+
+    def __init__(self, memo_size: int = 50000):
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, Tuple[float, Counter]]" = OrderedDict()
+
+    def _analyze_text(self, text: str) -> Tuple[float, Counter]:
+        key = hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+        hit = self._memo.get(key)
+        if hit is not None:
+            self._memo.move_to_end(key)
+            return hit
+
+        lowered = (text or "").lower()
+        phrases: Counter = Counter()
+        score = 0.0
+        hits = 0
+        for fragment in _BOUNDARY.split(lowered):
+            words = _WORD.findall(fragment)
+            current: List[str] = []
+            negate = 0
+            for w in words:
+                polarity = (w in POSITIVE) - (w in NEGATIVE)
+                if polarity:
+                    score += -polarity if negate else polarity
+                    hits += 1
+                negate = 2 if w in NEGATIONS else max(0, negate - 1)
+
+                if w in STOPWORDS or w.isdigit() or len(w) < 2:
+                    if current:
+                        phrases[" ".join(current)] += 1
+                        current = []
+                else:
+                    current.append(w)
+            if current:
+                phrases[" ".join(current)] += 1
+
+        sentiment = score / math.sqrt(hits + 4) if hits else 0.0
+        result = (max(-1.0, min(1.0, sentiment)), phrases)
+        self._memo[key] = result
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _label(score: float) -> str:
+        if score >= 0.1:
+            return "positive"
+        if score <= -0.1:
+            return "negative"
         return "neutral"
 
+    def sentiment_scores(self, texts: List[str]) -> List[float]:
+        return [self._analyze_text(t)[0] for t in texts]
+
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[str]:
+        return [self._label(s) for s in self.sentiment_scores(texts)]
+
+    def extract_keywords_batch(self, texts: List[str], top_k: int = 5) -> List[List[str]]:
+        docs = [self._analyze_text(t)[1] for t in texts]
+        df: Counter = Counter()
+        for phrases in docs:
+            df.update(phrases.keys())
+        n = len(docs)
+
+        keywords = []
+        for phrases in docs:
+            scored = []
+            for phrase, tf in phrases.items():
+                idf = math.log((1 + n) / (1 + df[phrase])) + 1
+                # Multi-word phrases carry more meaning than single words (RAKE degree)
+                scored.append((tf * idf * (1 + 0.5 * phrase.count(" ")), phrase))
+            scored.sort(key=lambda t: (-t[0], t[1]))
+            keywords.append([phrase for _, phrase in scored[:top_k]])
+        return keywords
+
+    def analyze_batch(self, texts: List[str], top_k: int = 5) -> List[Dict]:
+        scores = self.sentiment_scores(texts)
+        keywords = self.extract_keywords_batch(texts, top_k=top_k)
+        return [
+            {"sentiment": self._label(s), "sentiment_score": round(s, 3), "keywords": k}
+            for s, k in zip(scores, keywords)
+        ]
+
+    def tag_posts(self, posts: List[Dict], text_key: str = "copy", top_k: int = 5) -> List[Dict]:
+        """Return copies of posts with sentiment, sentiment_score and keywords added."""
+        tags = self.analyze_batch([str(p.get(text_key) or "") for p in posts], top_k=top_k)
+        return [{**p, **t} for p, t in zip(posts, tags)]
+
+    def analyze_sentiment(self, text: str) -> str:
+        return self.analyze_sentiment_batch([text])[0]
+
     def extract_keywords(self, text: str):
-        return []
+        return self.extract_keywords_batch([text])[0]
@@ -0,0 +1,185 @@
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_STRUCTURAL = re.compile(r'[{}\[\]",]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+# How far back close_partial() looks for a cut point that parses
+_MAX_CUT_ATTEMPTS = 200
+
+
+def close_partial(text: str) -> Optional[Any]:
+    """
+    Best-effort parse of a truncated JSON value: cut it back to the end of the
+    last complete string / object / array element and close every container
+    still open. Incomplete trailing values (a half-written string, number,
+    key or empty container) are dropped, not guessed. Returns None if
+    nothing usable is left.
+    """
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []  # (cut position, closers needed there)
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                cuts.append((i + 1, "".join(reversed(stack))))
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            # No cut here: a container that never got a complete element is dropped
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == ",":
+            # Everything before a comma is a complete value (numbers included)
+            cuts.append((i, "".join(reversed(stack))))
+
+    for cut, closers in reversed(cuts[-_MAX_CUT_ATTEMPTS:]):
+        try:
+            return json.loads(text[:cut].rstrip().rstrip(",") + closers)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONStreamParser:
+    """
+    Incremental parser for the first top-level JSON object in a stream of
+    text chunks (e.g. tokens from chat_completion(stream=True)).
+
+    It tracks string/escape state, so braces inside quoted values are ignored,
+    and emits each top-level field as (key, value) as soon as the field is
+    closed. Once the object's closing brace arrives, `done` is True and the
+    caller can stop the generation.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        self.on_field = on_field
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._field_start = 0
+        self._error: Optional[str] = None
+        self.parse_seconds = 0.0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the top-level fields it completed."""
+        if self.done or not chunk:
+            return []
+        started = time.perf_counter()
+        self.text += chunk
+        completed: List[Tuple[str, Any]] = []
+        buf = self.text
+
+        while self._pos < len(buf):
+            if self.start is None:
+                i = buf.find("{", self._pos)
+                if i == -1:
+                    self._pos = len(buf)
+                    break
+                self.start = i
+                self._depth = 1
+                self._field_start = i + 1
+                self._pos = i + 1
+                continue
+
+            if self._in_string:
+                m = _STRING_SPECIAL.search(buf, self._pos)
+                if m is None:
+                    self._pos = len(buf)
+                    break
+                i = m.start()
+                if m.group() == "\\":
+                    if i + 1 >= len(buf):
+                        # Escaped character hasn't arrived yet; resume here next chunk
+                        self._pos = i
+                        break
+                    self._pos = i + 2
+                    continue
+                self._in_string = False
+                self._pos = i + 1
+                continue
+
+            m = _STRUCTURAL.search(buf, self._pos)
+            if m is None:
+                self._pos = len(buf)
+                break
+            i = m.start()
+            ch = m.group()
+            self._pos = i + 1
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_field(i, completed)
+                    self.end = i + 1
+                    self.done = True
+                    break
+            elif self._depth == 1:  # top-level comma
+                self._close_field(i, completed)
+                self._field_start = i + 1
+
+        self.parse_seconds += time.perf_counter() - started
+        return completed
+
+    def _close_field(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        segment = self.text[self._field_start:end].strip()
+        if not segment:
+            return
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except ValueError as e:
+            if self._error is None:
+                self._error = f"{segment[:200]!r}: {e}"
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
+            if self.on_field is not None:
+                self.on_field(key, value)
+
+    def repair(self) -> Dict[str, Any]:
+        """
+        Like result(), but for a stream that was cut off: keep every completed
+        top-level field and whatever complete part of the trailing field
+        survives (e.g. the first weeks of a truncated execution_plan).
+        """
+        if self.done or self.start is None:
+            return self.result()
+        if self._error is not None:
+            raise ValueError(f"Could not parse JSON candidate:\n{self.text[self.start:]}\nError: {self._error}")
+        fields = dict(self.fields)
+        trailing = close_partial("{" + self.text[self._field_start:])
+        if isinstance(trailing, dict):
+            fields.update(trailing)
+        return fields
+
+    def result(self) -> Dict[str, Any]:
+        """Return the parsed object, or raise ValueError if it is incomplete or invalid."""
+        if self.start is None:
+            raise ValueError(f"No JSON object start found in model output:\n{self.text}")
+        if not self.done:
+            raise ValueError(f"No complete JSON object found in model output:\n{self.text}")
+        if self._error is not None:
+            raise ValueError(
+                f"Could not parse JSON candidate:\n{self.text[self.start:self.end]}\nError: {self._error}"
+            )
+        return dict(self.fields)
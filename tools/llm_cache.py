@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class LLMCache:
+    """
+    On-disk, content-addressed cache for parsed LLM outputs.
+
+    Entries are keyed by a hash of (model_id, system message, prompt, sampling
+    params) and evicted least-recently-used once they exceed max_entries /
+    max_bytes, or once they are older than ttl_seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = ".cmp_cache/llm.sqlite",
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def make_key(model_id: str, system: str, prompt: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"model": model_id, "system": system, "prompt": prompt, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss (or when disabled)."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                db.commit()
+                self.misses += 1
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds is not None:
+            db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Walk from least to most recently used until we're back under both limits
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM entries")
+            db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "bytes": total,
+        }
+
+    @classmethod
+    def from_env(
+        cls,
+        prefix: str = "CMP_LLM_CACHE",
+        path: str = ".cmp_cache/llm.sqlite",
+        ttl_seconds: float = 7 * 24 * 3600,
+    ) -> "LLMCache":
+        """
+        Build the cache from environment variables:
+        CMP_LLM_CACHE (set to 0/off/false to bypass), CMP_LLM_CACHE_PATH,
+        CMP_LLM_CACHE_MAX_ENTRIES, CMP_LLM_CACHE_MAX_MB, CMP_LLM_CACHE_TTL (seconds).
+
+        Other caches built on this class (e.g. web search) use their own prefix.
+        """
+        enabled = os.getenv(prefix, "1").strip().lower() not in ("0", "off", "false", "no")
+        ttl = os.getenv(f"{prefix}_TTL")
+        return cls(
+            path=os.getenv(f"{prefix}_PATH", path),
+            max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", "2000")),
+            max_bytes=int(float(os.getenv(f"{prefix}_MAX_MB", "64")) * 1024 * 1024),
+            ttl_seconds=float(ttl) if ttl else ttl_seconds,
+            enabled=enabled,
+        )
@@ -0,0 +1,160 @@
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+DEFAULT_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+
+
+class Route:
+    """
+    LLM settings for one pipeline stage.
+
+    expected_tokens is the completion length the stage's JSON schema calls
+    for; max_tokens is the hard ceiling, only used in full once a response
+    was cut off. model=None means the router's default model.
+
+    deadline is how many seconds one request may take before it is
+    abandoned (None: no limit). With hedge=True, a request still running
+    past the stage's p95 latency gets a duplicate, and the first to finish
+    wins.
+    """
+
+    __slots__ = ("model", "expected_tokens", "max_tokens", "temperature", "deadline", "hedge")
+
+    def __init__(
+        self,
+        expected_tokens: int,
+        max_tokens: int,
+        temperature: float = 0.4,
+        model: Optional[str] = None,
+        deadline: Optional[float] = 120.0,
+        hedge: bool = False,
+    ):
+        if expected_tokens <= 0 or max_tokens < expected_tokens:
+            raise ValueError("Need 0 < expected_tokens <= max_tokens")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("deadline must be positive")
+        self.model = model
+        self.expected_tokens = expected_tokens
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.deadline = deadline
+        self.hedge = hedge
+
+
+# Keyed by StageGraph stage name; None covers calls made outside a pipeline.
+# Estimates follow each agent's output schema: ten strategy sections, four
+# weeks of plan, three research keys, a campaign outline or two posts.
+# Deadlines leave a full max_tokens generation room on a busy shared endpoint.
+DEFAULT_ROUTES: Dict[Optional[str], Route] = {
+    None: Route(expected_tokens=1400, max_tokens=1400, deadline=180),
+    "planner": Route(expected_tokens=1100, max_tokens=1400, deadline=180),
+    "execution_plan": Route(expected_tokens=500, max_tokens=900, deadline=120),
+    "researcher": Route(expected_tokens=450, max_tokens=800, deadline=90),
+    "writer": Route(expected_tokens=500, max_tokens=900, deadline=120),
+}
+
+# Per-agent model overrides, as documented in the README
+MODEL_ENV = {
+    "planner": "PLANNER_MODEL",
+    "execution_plan": "PLANNER_MODEL",
+    "researcher": "RESEARCH_MODEL",
+    "writer": "WRITER_MODEL",
+}
+
+
+class LLMRouter:
+    """
+    Picks the model, temperature and max_tokens for each LLM call from the
+    stage it runs in.
+
+    max_tokens starts at the route's schema estimate. Once a stage has
+    min_samples completions on record, it becomes their p95 length plus
+    headroom, so stages with short outputs get smaller caps (and queue less
+    on the endpoint). Either way it stays within the route's max_tokens,
+    which is what a truncated response falls back to.
+
+    Request latencies are kept per stage too; hedge_after() is their p95
+    for routes with hedge=True.
+    """
+
+    def __init__(
+        self,
+        default_model: str = DEFAULT_MODEL,
+        routes: Optional[Dict[Optional[str], Route]] = None,
+        headroom: float = 1.25,
+        min_samples: int = 5,
+        history: int = 50,
+    ):
+        self.default_model = default_model
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self._history: Dict[Optional[str], Deque[int]] = {}
+        self._latency: Dict[Optional[str], Deque[float]] = {}
+        self._history_size = history
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMRouter":
+        """
+        Default model from HF_MODEL_ID; per-agent models from PLANNER_MODEL,
+        RESEARCH_MODEL and WRITER_MODEL; hedged stages from CMP_HEDGE_STAGES,
+        e.g. "planner,writer".
+        """
+        hedged = {s.strip() for s in os.getenv("CMP_HEDGE_STAGES", "").split(",") if s.strip()}
+        routes = {}
+        for stage, base in DEFAULT_ROUTES.items():
+            model = os.getenv(MODEL_ENV[stage]) if stage in MODEL_ENV else None
+            if model or stage in hedged:
+                routes[stage] = Route(
+                    base.expected_tokens,
+                    base.max_tokens,
+                    base.temperature,
+                    model or base.model,
+                    deadline=base.deadline,
+                    hedge=base.hedge or stage in hedged,
+                )
+        return cls(default_model=os.getenv("HF_MODEL_ID", DEFAULT_MODEL), routes=routes)
+
+    def route(self, stage: Optional[str]) -> Route:
+        return self.routes.get(stage) or self.routes[None]
+
+    def model(self, stage: Optional[str]) -> str:
+        return self.route(stage).model or self.default_model
+
+    def max_tokens(self, stage: Optional[str]) -> int:
+        route = self.route(stage)
+        p95 = self._p95(self._history, stage)
+        if p95 is None:
+            return route.expected_tokens
+        return max(1, min(route.max_tokens, math.ceil(p95 * self.headroom)))
+
+    def hedge_after(self, stage: Optional[str]) -> Optional[float]:
+        """Seconds after which to hedge a request in stage, or None (hedging off, or too little history)."""
+        if not self.route(stage).hedge:
+            return None
+        return self._p95(self._latency, stage)
+
+    def record(self, stage: Optional[str], completion_tokens: int, seconds: Optional[float] = None) -> None:
+        """Note the length (and optionally the latency) of a finished completion for stage."""
+        with self._lock:
+            self._append(self._history, stage, completion_tokens)
+            if seconds is not None:
+                self._append(self._latency, stage, seconds)
+
+    def _append(self, history: Dict[Optional[str], Deque], stage: Optional[str], value: float) -> None:
+        # caller holds self._lock
+        seen = history.get(stage)
+        if seen is None:
+            seen = history[stage] = deque(maxlen=self._history_size)
+        seen.append(value)
+
+    def _p95(self, history: Dict[Optional[str], Deque], stage: Optional[str]) -> Optional[float]:
+        with self._lock:
+            seen = sorted(history.get(stage, ()))
+        if len(seen) < self.min_samples:
+            return None
+        return seen[min(len(seen) - 1, math.ceil(0.95 * len(seen)) - 1)]
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, List, Optional
+
+# Same shape as the GPT/Llama pre-tokenizers: contractions, words, numbers,
+# punctuation runs. Long words cost roughly one token per 4 characters.
+_PRETOKEN = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+", re.UNICODE)
+
+# Progressively harsher (max string chars, max list items) limits for trimming
+_TRIM_LEVELS = [(600, 12), (300, 8), (160, 5), (80, 3), (40, 2), (20, 1)]
+
+
+@lru_cache(maxsize=1)
+def _tiktoken_encoder():
+    """tiktoken is opt-in (CMP_TOKENIZER=tiktoken): its vocab is downloaded on first use."""
+    if os.getenv("CMP_TOKENIZER", "").lower() != "tiktoken":
+        return None
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens locally, without calling the inference endpoint."""
+    if not text:
+        return 0
+    encoder = _tiktoken_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    total = 0
+    for piece in _PRETOKEN.findall(text):
+        total += 1 if len(piece) <= 5 else (len(piece) + 3) // 4
+    return total
+
+
+def drop_empty(value: Any) -> Any:
+    """Recursively remove None, empty strings, empty lists and empty dicts."""
+    if isinstance(value, dict):
+        cleaned = {k: drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        cleaned = [drop_empty(v) for v in value]
+        return [v for v in cleaned if v not in (None, "", [], {})]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def compact_json(value: Any) -> str:
+    """Minified JSON with empty fields dropped; plain strings pass through."""
+    if isinstance(value, str):
+        return value.strip()
+    return json.dumps(drop_empty(value), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _trim(value: Any, max_chars: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars].rstrip() + "…"
+    if isinstance(value, list):
+        return [_trim(v, max_chars, max_items) for v in value[:max_items]]
+    if isinstance(value, dict):
+        return {k: _trim(v, max_chars, max_items) for k, v in value.items()}
+    return value
+
+
+class _Section:
+    def __init__(self, title: Optional[str], content: Any, priority: int, fixed: bool):
+        self.title = title
+        self.content = content
+        self.priority = priority
+        self.fixed = fixed
+        self.text = compact_json(content)
+
+    def render(self) -> str:
+        return f"{self.title}:\n{self.text}" if self.title else self.text
+
+
+class PromptBuilder:
+    """
+    Assemble an agent prompt from titled sections under a token budget.
+
+    Structured content is serialized as minified JSON with empty fields
+    dropped. If the prompt is over budget, non-fixed sections are trimmed
+    (long strings shortened, long lists cut) starting from the lowest
+    priority, and dropped entirely as a last resort. Fixed sections
+    (instructions, task) are never touched.
+    """
+
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = budget_tokens
+        self.sections: List[_Section] = []
+
+    def add(self, title: Optional[str], content: Any, priority: int = 0, fixed: bool = False) -> "PromptBuilder":
+        self.sections.append(_Section(title, content, priority, fixed))
+        return self
+
+    def text(self, content: str) -> "PromptBuilder":
+        """Add untitled, never-trimmed instruction text."""
+        return self.add(None, content, fixed=True)
+
+    def _render(self) -> str:
+        return "\n\n".join(s.render() for s in self.sections if s.text)
+
+    def tokens(self) -> int:
+        return count_tokens(self._render())
+
+    def build(self) -> str:
+        prompt = self._render()
+        if count_tokens(prompt) <= self.budget_tokens:
+            return prompt
+
+        for section in sorted((s for s in self.sections if not s.fixed), key=lambda s: s.priority):
+            for max_chars, max_items in _TRIM_LEVELS:
+                section.text = self._trimmed_text(section, max_chars, max_items)
+                prompt = self._render()
+                if count_tokens(prompt) <= self.budget_tokens:
+                    return prompt
+            section.text = ""
+            prompt = self._render()
+            if count_tokens(prompt) <= self.budget_tokens:
+                return prompt
+        return prompt
+
+    @staticmethod
+    def _trimmed_text(section: _Section, max_chars: int, max_items: int) -> str:
+        if isinstance(section.content, str):
+            # Free text (e.g. search snippets): keep whole leading lines first
+            lines = [line for line in section.content.strip().splitlines() if line.strip()]
+            return "\n".join(_trim(line, max_chars, max_items) for line in lines[:max_items])
+        return compact_json(_trim(section.content, max_chars, max_items))
@@ -0,0 +1,274 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from concurrent.futures import CancelledError
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+# Status codes that mean "slow down", not "this request is wrong"
+RETRYABLE_STATUS = (429, 503)
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None)
+    if status is None and type(exc).__name__ in ("UsageLimitExceededError", "TavilyKeylessLimitError"):
+        return 429  # tavily raises these on a 429 and drops the response
+    return status
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return _status(exc) in RETRYABLE_STATUS
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After, in seconds or as an HTTP date), or None."""
+    seconds = getattr(exc, "retry_after_seconds", None)
+    if seconds is not None:
+        return float(seconds)
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute, holding at most capacity (default: one
+    minute's worth). reserve() always succeeds and returns how long the
+    caller must wait, so concurrent callers queue in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    Client-side limits for one provider, shared by every thread and event
+    loop in the process:
+
+    - requests per minute and (for LLMs) tokens per minute, as token buckets;
+    - an AIMD concurrency limit: +1 slot per limit successes, halved (at
+      most once per decrease_interval) when the provider answers 429/503;
+    - retries of 429/503 responses, waiting Retry-After when the provider
+      sends one and exponential backoff with jitter otherwise. A Retry-After
+      pauses every caller, not just the one that got it.
+
+    call() / acall() run one request under all of the above and record the
+    retries and the time spent throttled on the given span. call() also
+    takes a cancel event (e.g. a hedging.Cancellation); once it is set, no
+    further attempt starts, waits end early and CancelledError is raised.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        decrease_interval: float = 1.0,
+    ):
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError("Need 1 <= min_concurrency <= max_concurrency")
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @classmethod
+    def from_env(cls, provider: str, max_concurrency: int = 8) -> "RateLimiter":
+        """CMP_<PROVIDER>_RPM, CMP_<PROVIDER>_TPM and CMP_<PROVIDER>_MAX_CONCURRENCY, e.g. CMP_HF_RPM."""
+        prefix = f"CMP_{provider.upper()}"
+        rpm, tpm = os.getenv(f"{prefix}_RPM"), os.getenv(f"{prefix}_TPM")
+        return cls(
+            provider,
+            rpm=float(rpm) if rpm else None,
+            tpm=float(tpm) if tpm else None,
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(max_concurrency))),
+        )
+
+    def _delay(self, tokens: float) -> float:
+        """Wait owed to the buckets for one request of `tokens` tokens, plus any Retry-After pause."""
+        wait = self._paused_until - time.monotonic()
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return max(0.0, wait)
+
+    def _try_enter(self) -> bool:
+        # caller holds self._lock
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # that waiter's loop has closed
+
+    def _enter(self, cancel=None) -> None:
+        with self._lock:
+            while not self._try_enter():
+                _check(cancel)
+                # poll while cancellable: nothing notifies us when cancel is set
+                self._cond.wait(None if cancel is None else 0.05)
+
+    async def _aenter(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_enter():
+                    return
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            await future
+
+    def _succeeded(self) -> None:
+        with self._lock:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def _overloaded(self, exc: BaseException, attempt: int) -> float:
+        """Shrink the window and return how long to wait before the next attempt."""
+        pause = retry_after(exc)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_decrease >= self.decrease_interval:
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                self._last_decrease = now
+            if pause is not None:
+                self._paused_until = max(self._paused_until, now + pause)
+        if pause is not None:
+            return pause
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0, span=None, cancel=None) -> Any:
+        retries, throttled = 0, 0.0
+        try:
+            while True:
+                wait = self._delay(tokens)
+                start = time.perf_counter()
+                _sleep(wait, cancel)
+                self._enter(cancel)
+                throttled += time.perf_counter() - start
+                try:
+                    _check(cancel)
+                    result = fn()
+                except Exception as e:
+                    if not is_retryable(e) or retries >= self.max_retries or (cancel is not None and cancel.is_set()):
+                        raise
+                    pause = self._overloaded(e, retries)
+                else:
+                    self._succeeded()
+                    return result
+                finally:
+                    self._leave()
+                retries += 1
+                start = time.perf_counter()
+                _sleep(pause, cancel)
+                throttled += time.perf_counter() - start
+        finally:
+            _record(span, retries, throttled)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: float = 0, span=None) -> Any:
+        retries, throttled = 0, 0.0
+        try:
+            while True:
+                wait = self._delay(tokens)
+                start = time.perf_counter()
+                await asyncio.sleep(wait)
+                await self._aenter()
+                throttled += time.perf_counter() - start
+                try:
+                    result = await fn()
+                except Exception as e:
+                    if not is_retryable(e) or retries >= self.max_retries:
+                        raise
+                    pause = self._overloaded(e, retries)
+                else:
+                    self._succeeded()
+                    return result
+                finally:
+                    self._leave()
+                retries += 1
+                start = time.perf_counter()
+                await asyncio.sleep(pause)
+                throttled += time.perf_counter() - start
+        finally:
+            _record(span, retries, throttled)
+
+
+def _check(cancel) -> None:
+    if cancel is not None and cancel.is_set():
+        raise CancelledError()
+
+
+def _sleep(seconds: float, cancel) -> None:
+    if cancel is None:
+        time.sleep(seconds)
+    elif seconds > 0:
+        cancel.wait(seconds)
+    _check(cancel)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _record(span, retries: int, throttled: float) -> None:
+    if span is None:
+        return
+    if retries:
+        span.set(retries=span.attrs.get("retries", 0) + retries)
+    if throttled >= 0.001:
+        span.set(throttle_ms=round(span.attrs.get("throttle_ms", 0) + throttled * 1000, 2))
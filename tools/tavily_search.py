@@ -1,14 +1,136 @@
+import asyncio
+import hashlib
 import os
-from tavily import TavilyClient
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict
+
+from . import clients
+from .llm_cache import LLMCache
+from .tracing import trace_span
+
+
+def _default_cache() -> LLMCache:
+    """
+    Process-wide search cache (CMP_SEARCH_CACHE=0 to bypass). The same topics
+    come up across briefs all day, so results are kept for 24h by default.
+    """
+    clients.load_env()
+    return clients.shared(
+        "search_cache",
+        lambda: LLMCache.from_env(
+            prefix="CMP_SEARCH_CACHE", path=".cmp_cache/search.sqlite", ttl_seconds=24 * 3600
+        ),
+    )
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def compact_results(res: Dict[str, Any], max_chars: int = 600) -> str:
+    """
+    Render a Tavily response as short "title (url): content" lines, dropping
+    scores, images and request metadata that would only inflate the prompt.
+    """
+    lines = []
+    for r in res.get("results", []):
+        title = (r.get("title") or "").strip()
+        url = (r.get("url") or "").strip()
+        content = " ".join((r.get("content") or "").split())
+        if len(content) > max_chars:
+            content = content[:max_chars].rsplit(" ", 1)[0] + "…"
+        lines.append(f"- {title} ({url}): {content}")
+    return "\n".join(lines)
 
-load_dotenv()
 
 class TavilySearchTool:
-    def __init__(self):
-        api_key = os.getenv("TAVILY_API_KEY")
-        self.client = TavilyClient(api_key=api_key)
+    """
+    Web search with a TTL cache keyed by normalized query, and single-flight
+    coalescing so concurrent identical queries share one request.
+    """
+
+    def __init__(self, cache: LLMCache | None = None, max_results: int = 5):
+        clients.load_env()
+        self.client = clients.tavily_client(os.getenv("TAVILY_API_KEY"))
+        self.cache = cache if cache is not None else _default_cache()
+        self.max_results = max_results
+        self.limiter = clients.rate_limiter("tavily")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.max_results}:{normalize_query(query)}".encode("utf-8")).hexdigest()
 
     def search(self, query: str) -> str:
-        res = self.client.search(query=query, max_results=5)
-        return str(res)
+        with trace_span("search", kind="search", cache_hit=False) as span:
+            key = self._key(query)
+            cached = self.cache.get(key)
+            if cached is not None:
+                span.set(cache_hit=True)
+                return cached
+
+            with self._lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+            if not owner:
+                span.set(coalesced=True)
+                return future.result()
+
+            try:
+                res = self.limiter.call(
+                    lambda: self.client.search(query=query, max_results=self.max_results), span=span
+                )
+                text = compact_results(res)
+                self.cache.set(key, text)
+                future.set_result(text)
+                return text
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+
+class AsyncTavilySearchTool(TavilySearchTool):
+    """
+    Non-blocking variant of TavilySearchTool for the asyncio pipeline. The
+    client is bound to the running event loop, so build it inside that loop.
+    """
+
+    def __init__(self, cache: LLMCache | None = None, max_results: int = 5):
+        clients.load_env()
+        self.client = clients.async_tavily_client(os.getenv("TAVILY_API_KEY"))
+        self.cache = cache if cache is not None else _default_cache()
+        self.max_results = max_results
+        self.limiter = clients.rate_limiter("tavily")
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def _fetch(self, query: str, key: str, span) -> str:
+        res = await self.limiter.acall(
+            lambda: self.client.search(query=query, max_results=self.max_results), span=span
+        )
+        text = compact_results(res)
+        self.cache.set(key, text)
+        return text
+
+    async def search(self, query: str) -> str:
+        with trace_span("search", kind="search", cache_hit=False) as span:
+            key = self._key(query)
+            cached = self.cache.get(key)
+            if cached is not None:
+                span.set(cache_hit=True)
+                return cached
+
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(query, key, span))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                span.set(coalesced=True)
+            # shield: one cancelled caller must not cancel the request for the others
+            return await asyncio.shield(task)
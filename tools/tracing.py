@@ -0,0 +1,155 @@
+import itertools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_tracer: ContextVar[Optional["Tracer"]] = ContextVar("cmp_tracer", default=None)
+_parent: ContextVar[Optional["Span"]] = ContextVar("cmp_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    """One timed unit of work: a pipeline stage, an LLM call or a web search."""
+
+    __slots__ = ("id", "parent_id", "name", "kind", "start", "end", "attrs")
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[int], attrs: Dict[str, Any]):
+        self.id = next(_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Tracer:
+    """Collects the spans of one pipeline run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def to_json(self) -> Dict[str, Any]:
+        spans = []
+        totals: Dict[str, float] = defaultdict(float)
+        for s in sorted(self.spans, key=lambda s: s.start):
+            spans.append({
+                "id": s.id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "kind": s.kind,
+                "start_ms": round((s.start - self.start) * 1000, 2),
+                "duration_ms": round(s.duration * 1000, 2),
+                **s.attrs,
+            })
+            if s.kind == "llm":
+                totals["llm_calls"] += 1
+                totals["prompt_tokens"] += s.attrs.get("prompt_tokens", 0)
+                totals["completion_tokens"] += s.attrs.get("completion_tokens", 0)
+                totals["cache_hits"] += bool(s.attrs.get("cache_hit"))
+        end = max((s.start + s.duration for s in self.spans), default=self.start)
+        totals["wall_ms"] = round((end - self.start) * 1000, 2)
+        return {"spans": spans, "totals": dict(totals)}
+
+
+class _Metrics:
+    """Process-wide cumulative counters, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[tuple, float] = defaultdict(float)
+
+    def observe(self, span: Span) -> None:
+        labels = (("kind", span.kind), ("name", span.name))
+        a = span.attrs
+        with self._lock:
+            self.counters[("cmp_span_seconds_sum", labels)] += span.duration
+            self.counters[("cmp_span_seconds_count", labels)] += 1
+            if "prompt_tokens" in a:
+                self.counters[("cmp_llm_tokens_total", labels + (("type", "prompt"),))] += a["prompt_tokens"]
+            if "completion_tokens" in a:
+                self.counters[("cmp_llm_tokens_total", labels + (("type", "completion"),))] += a["completion_tokens"]
+            if "cache_hit" in a:
+                outcome = "hit" if a["cache_hit"] else "miss"
+                self.counters[("cmp_cache_requests_total", labels + (("result", outcome),))] += 1
+            if a.get("retries"):
+                self.counters[("cmp_retries_total", labels)] += a["retries"]
+            if a.get("throttle_ms"):
+                self.counters[("cmp_throttle_seconds_sum", labels)] += a["throttle_ms"] / 1000
+            if a.get("hedged"):
+                self.counters[("cmp_hedges_total", labels)] += 1
+                self.counters[("cmp_hedge_wins_total", labels)] += bool(a.get("hedge_won"))
+            if a.get("deadline_exceeded"):
+                self.counters[("cmp_deadline_exceeded_total", labels)] += 1
+            if "parse_ms" in a:
+                self.counters[("cmp_json_parse_seconds_sum", labels)] += a["parse_ms"] / 1000
+            if a.get("error"):
+                self.counters[("cmp_errors_total", labels)] += 1
+
+    def snapshot(self) -> str:
+        with self._lock:
+            items = sorted(self.counters.items())
+        lines = []
+        for (metric, labels), value in items:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+
+
+METRICS = _Metrics()
+
+
+def prometheus_snapshot() -> str:
+    """Cumulative span, token, cache, retry, throttling, hedging and parse metrics since process start."""
+    return METRICS.snapshot()
+
+
+@contextmanager
+def activate(tracer: Tracer):
+    """Make tracer the destination for spans opened in this context (and its tasks)."""
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+
+
+@contextmanager
+def trace_span(name: str, kind: str = "stage", **attrs):
+    """
+    Time a block as a child of the current span. Always yields a Span so
+    callers can attach attributes; it is only recorded if a tracer is active,
+    but always feeds the process-wide metrics.
+    """
+    parent = _parent.get()
+    span = Span(name, kind, parent.id if parent else None, attrs)
+    token = _parent.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set(error=f"{type(e).__name__}: {e}"[:300])
+        raise
+    finally:
+        span.end = time.perf_counter()
+        _parent.reset(token)
+        tracer = _tracer.get()
+        if tracer is not None:
+            with tracer._lock:
+                tracer.spans.append(span)
+        METRICS.observe(span)
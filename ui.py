@@ -1,8 +1,14 @@
-import ast
+import asyncio
+from dataclasses import asdict
+from datetime import date
+
 import streamlit as st
 import pandas as pd
 
-from main import run_campaign
+from main import iter_campaign_events, make_async_llm
+from models import CampaignPlan, Strategy, campaigns_adapter, posts_adapter
+from pipeline import StageMemo, brief_hash
+from tools import AsyncTavilySearchTool, clients
 
 
 st.set_page_config(
@@ -15,101 +21,46 @@ st.title("🧠 CMP – Content Marketing Planner")
 st.caption("World-class, brief-aware content marketing planner that thinks, checks, and optimizes.")
 
 
-def as_list(value):
-    """Normalize value to a list for clean bullet rendering."""
-    if value is None:
-        return []
-    if isinstance(value, list):
-        return value
-    # try to parse "['a','b']" style strings
-    if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
-        try:
-            parsed = ast.literal_eval(value)
-            if isinstance(parsed, list):
-                return parsed
-        except Exception:
-            pass
-    return [value]
-
-
-def safe_text(value) -> str:
-    """Return a clean string for display or an empty string."""
-    if value is None:
-        return ""
-    if isinstance(value, str):
-        return value.strip()
-    return str(value)
+@st.cache_resource(show_spinner=False)
+def get_runtime():
+    """
+    One background event loop with its async LLM and search clients, shared
+    by every session and rerun so connections stay warm between runs.
+    """
+    loop = clients.background_loop()
 
+    async def build():
+        return make_async_llm(), AsyncTavilySearchTool()
 
-# ---------- Brief form ----------
-with st.form("cmp_brief_form"):
-    col1, col2 = st.columns(2)
+    llm, search_tool = asyncio.run_coroutine_threadsafe(build(), loop).result()
+    return loop, llm, search_tool
 
-    with col1:
-        topic = st.text_input("Campaign topic", "AI tools for small businesses")
-        product = st.text_input("Product / offer", "AI automation SaaS for SMEs")
-        target_audience = st.text_area(
-            "Target audience (who are we talking to?)",
-            "Owners of small service businesses in US/Europe.",
-            height=80,
-        )
-        preferred_channels = st.text_input(
-            "Preferred channels",
-            "LinkedIn, email, blog, YouTube shorts",
-        )
 
-    with col2:
-        goals_kpis = st.text_area(
-            "Goals & KPIs",
-            "Increase trials by 30% in 3 months; KPIs: trials, demo bookings, CTR.",
-            height=80,
-        )
-        budget = st.text_input(
-            "Budget & resources",
-            "Low to medium budget; mostly organic content and small paid tests.",
-        )
-        timeline_weeks = st.number_input(
-            "Timeline (weeks)", min_value=2, max_value=12, value=6, step=1
-        )
-        constraints = st.text_area(
-            "Constraints / must-nots",
-            "No misleading claims; avoid heavy technical jargon; limited design team.",
-            height=80,
-        )
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Completed plans keyed by brief hash and run date, shared by every session."""
+    return StageMemo(max_entries=32)
 
-    additional_notes = st.text_area(
-        "Additional notes (optional)",
-        "",
-        height=60,
-    )
 
-    submitted = st.form_submit_button("Generate CMP Plan ")
+@st.cache_resource(show_spinner=False)
+def get_stage_memo():
+    """Per-stage outputs, so editing one brief field only re-runs the stages it affects."""
+    return StageMemo(max_entries=256)
 
 
-# ---------- Run CMP ----------
-if submitted:
-    brief = {
-        "topic": topic,
-        "product": product,
-        "target_audience": target_audience,
-        "goals_kpis": goals_kpis,
-        "budget": budget,
-        "preferred_channels": preferred_channels,
-        "timeline_weeks": int(timeline_weeks),
-        "constraints": constraints,
-        "additional_notes": additional_notes,
-    }
+STAGE_LABELS = {
+    "planner": "Planning strategy",
+    "execution_plan": "Planning week by week",
+    "search": "Searching the web",
+    "researcher": "Validating market & trends",
+    "writer": "Drafting campaigns & posts",
+    "metrics": "Simulating metrics",
+    "optimizer": "Ranking posts & designing experiments",
+    "calendar": "Building calendar",
+}
 
-    with st.spinner("Thinking, validating, and planning your campaign..."):
-        result = run_campaign(brief)
 
-    strategy = result["strategy"]
-    campaigns = result["campaigns"]
-    posts = result["posts"]
-    calendar = result["calendar"]
-    experiments = result["experiments"]
-
-    # ----- Brief summary -----
+def render_brief(brief):
     st.markdown("###  Brief (what CMP understood)")
     st.markdown(
         f"""
@@ -125,7 +76,8 @@ if submitted:
 """
     )
 
-    # ----- Strategy sections -----
+
+def render_strategy(strategy: Strategy):
     st.markdown("###  Strategy ")
     col_left, col_right = st.columns(2, gap="large")
 
@@ -133,110 +85,71 @@ if submitted:
     with col_left:
         # Strategy overview
         with st.expander("Strategy overview", expanded=True):
-            so = strategy.get("strategy_overview", {})
-            summary = safe_text(so.get("summary"))
-            if summary:
+            so = strategy.strategy_overview
+            if so.summary:
                 st.markdown("**Summary**")
-                st.write(summary)
+                st.write(so.summary)
 
-            key_msgs = as_list(so.get("key_messages"))
-            if key_msgs:
+            if so.key_messages:
                 st.markdown("**Key messages**")
-                for m in key_msgs:
+                for m in so.key_messages:
                     st.markdown(f"- {m}")
 
-            chs = as_list(so.get("channels"))
-            if chs:
+            if so.channels:
                 st.markdown("**Core channels**")
-                st.markdown(", ".join(chs))
+                st.markdown(", ".join(so.channels))
 
-            vnotes = as_list(strategy.get("validation_notes"))
-            if vnotes:
+            if strategy.validation_notes:
                 st.markdown("**Validation notes**")
-                for n in vnotes:
+                for n in strategy.validation_notes:
                     st.markdown(f"- {n}")
 
         # Target audience
         with st.expander("Target audience", expanded=False):
-            ta = strategy.get("target_audience", {})
-            seg = safe_text(ta.get("description") or ta.get("segment"))
-            if seg:
-                st.markdown(f"**Segment:** {seg}")
-            loc = safe_text(ta.get("location"))
-            if loc:
-                st.markdown(f"**Location:** {loc}")
-
-            pains = as_list(ta.get("pain_points") or ta.get("painpoints"))
-            if pains:
+            ta = strategy.target_audience
+            if ta.description:
+                st.markdown(f"**Segment:** {ta.description}")
+            if ta.location:
+                st.markdown(f"**Location:** {ta.location}")
+
+            if ta.pain_points:
                 st.markdown("**Pain points**")
-                for p in pains:
+                for p in ta.pain_points:
                     st.markdown(f"- {p}")
 
-            interests = as_list(ta.get("interests"))
-            if interests:
+            if ta.interests:
                 st.markdown("**Interests**")
-                for i in interests:
+                for i in ta.interests:
                     st.markdown(f"- {i}")
 
         # Market analysis
         with st.expander("Market analysis", expanded=False):
-            ma = strategy.get("market_analysis", {})
-            msize = safe_text(ma.get("market_size"))
-            if msize:
-                st.markdown(f"**Market size:** {msize}")
-            trends = as_list(ma.get("market_trends"))
-            if trends:
+            ma = strategy.market_analysis
+            if ma.market_size:
+                st.markdown(f"**Market size:** {ma.market_size}")
+            if ma.market_trends:
                 st.markdown("**Trends**")
-                for t in trends:
+                for t in ma.market_trends:
                     st.markdown(f"- {t}")
-            comps = as_list(ma.get("competitor_analysis"))
-            if comps:
+            if ma.competitor_analysis:
                 st.markdown("**Competitors**")
-                for c in comps:
+                for c in ma.competitor_analysis:
                     st.markdown(f"- {c}")
-            insights = as_list(ma.get("market_insights"))
-            if insights:
+            if ma.market_insights:
                 st.markdown("**Insights**")
-                for ins in insights:
+                for ins in ma.market_insights:
                     st.markdown(f"- {ins}")
 
         # Customer journey
         with st.expander("Customer journey", expanded=False):
-            cj = strategy.get("customer_journey", {})
-
-            if isinstance(cj, list):
-                for stage in cj:
-                    if isinstance(stage, dict):
-                        title = safe_text(stage.get("stage") or "Stage")
-                        st.markdown(f"**{title}**")
-
-                        desc = safe_text(stage.get("description"))
-                        if desc:
-                            st.write(desc)
-
-                        kms = as_list(stage.get("key_messages"))
-                        if kms:
-                            for km in kms:
-                                st.markdown(f"- {km}")
-                    else:
-                        st.markdown(f"- {stage}")
-
-            elif isinstance(cj, dict):
-                for stage_name, data in cj.items():
-                    st.markdown(f"**{safe_text(stage_name)}**")
-
-                    if isinstance(data, dict):
-                        desc = safe_text(data.get("description"))
-                        if desc:
-                            st.write(desc)
-
-                        kms = as_list(data.get("key_messages"))
-                        if kms:
-                            for km in kms:
-                                st.markdown(f"- {km}")
-                    else:
-                        st.write(safe_text(data))
-
+            if strategy.customer_journey:
+                for stage in strategy.customer_journey:
+                    if stage.stage:
+                        st.markdown(f"**{stage.stage}**")
+                    if stage.description:
+                        st.write(stage.description)
+                    for km in stage.key_messages:
+                        st.markdown(f"- {km}")
             else:
                 st.info("No customer journey details provided in the strategy.")
 
@@ -244,75 +157,48 @@ if submitted:
     with col_right:
         # Objectives & KPIs
         with st.expander("Objectives & KPIs", expanded=True):
-            ok = strategy.get("objectives_kpis", {})
-            has_content = False
-
-            if isinstance(ok, dict):
-                desc = safe_text(ok.get("description") or ok.get("objectives"))
-                if desc:
-                    has_content = True
-                    st.markdown("**Objectives**")
-                    st.write(desc)
-
-                kpis = as_list(ok.get("kpis") or ok.get("kpi"))
-                if kpis:
-                    has_content = True
-                    st.markdown("**KPIs**")
-                    for k in kpis:
-                        st.markdown(f"- {k}")
-
-            elif isinstance(ok, list):
-                if ok:
-                    has_content = True
-                    st.markdown("**Objectives & KPIs**")
-                    for item in ok:
-                        if isinstance(item, dict):
-                            desc = safe_text(
-                                item.get("description")
-                                or item.get("objective")
-                                or item.get("name")
-                            )
-                            if desc:
-                                st.markdown(f"- {desc}")
-                        else:
-                            st.markdown(f"- {safe_text(item)}")
-
-            if not has_content:
+            ok = strategy.objectives_kpis
+
+            if ok.objectives:
+                st.markdown("**Objectives**")
+                st.write(ok.objectives)
+
+            if ok.kpis:
+                st.markdown("**KPIs**")
+                for k in ok.kpis:
+                    st.markdown(f"- {k}")
+
+            if ok.items:
+                st.markdown("**Objectives & KPIs**")
+                for item in ok.items:
+                    st.markdown(f"- {item}")
+
+            if not (ok.objectives or ok.kpis or ok.items):
                 st.info("No objectives & KPIs details provided in the strategy.")
 
         # Messaging & positioning
         with st.expander("Messaging & positioning", expanded=False):
-            mp = strategy.get("messaging_positioning", {})
-            msg = safe_text(mp.get("messaging") or mp.get("positioning_statement"))
-            pos = safe_text(mp.get("positioning") or mp.get("unique_value_proposition"))
-            kms = as_list(mp.get("key_messages"))
-
-            has_content = False
+            mp = strategy.messaging_positioning
 
-            if msg:
-                has_content = True
+            if mp.messaging:
                 st.markdown("**Messaging**")
-                st.write(msg)
+                st.write(mp.messaging)
 
-            if pos:
-                has_content = True
+            if mp.positioning:
                 st.markdown("**Positioning**")
-                st.write(pos)
+                st.write(mp.positioning)
 
-            if kms:
-                has_content = True
+            if mp.key_messages:
                 st.markdown("**Key messages**")
-                for km in kms:
+                for km in mp.key_messages:
                     st.markdown(f"- {km}")
 
-            if not has_content:
+            if not (mp.messaging or mp.positioning or mp.key_messages):
                 st.info("No messaging & positioning details provided in the strategy.")
 
         # Channel strategy
         with st.expander("Channel strategy", expanded=False):
-            cs = strategy.get("channel_strategy", {})
-            chs = cs.get("channels") if isinstance(cs, dict) else cs
-            chs = as_list(chs)
+            chs = strategy.channel_strategy.channels
             if chs:
                 st.markdown("**Channels**")
                 st.markdown(", ".join(chs))
@@ -321,118 +207,73 @@ if submitted:
 
         # Budget plan
         with st.expander("Budget plan", expanded=False):
-            bp = strategy.get("budget_plan", {})
-
-            total_budget = safe_text(bp.get("budget") or bp.get("total_budget"))
-            notes = safe_text(bp.get("notes") or bp.get("description"))
-            raw_alloc = bp.get("allocation") or bp.get("items") or bp.get("breakdown")
-            alloc = as_list(raw_alloc)
-
-            has_content = False
+            bp = strategy.budget_plan
 
-            if total_budget:
-                has_content = True
-                st.markdown(f"**Total budget:** {total_budget}")
+            if bp.total_budget:
+                st.markdown(f"**Total budget:** {bp.total_budget}")
 
-            if notes:
-                has_content = True
+            if bp.notes:
                 st.markdown("**Notes**")
-                st.write(notes)
+                st.write(bp.notes)
 
-            if alloc:
-                has_content = True
+            if bp.allocation:
                 st.markdown("**Allocation**")
-                for a in alloc:
-                    if isinstance(a, dict):
-                        label = (
-                            a.get("category")
-                            or a.get("channel")
-                            or a.get("item")
-                            or "Item"
-                        )
-                        amount = (
-                            a.get("allocation")
-                            or a.get("budget")
-                            or a.get("cost")
-                            or ""
-                        )
-                        extra = a.get("notes") or ""
-                        line = f"- {label}"
-                        if amount:
-                            line += f": {amount}"
-                        st.markdown(line)
-                        if extra:
-                            st.markdown(f"  - {extra}")
-                    else:
-                        st.markdown(f"- {a}")
-
-            if not has_content:
+                for a in bp.allocation:
+                    line = f"- {a.label}"
+                    if a.amount:
+                        line += f": {a.amount}"
+                    st.markdown(line)
+                    if a.notes:
+                        st.markdown(f"  - {a.notes}")
+
+            if not (bp.total_budget or bp.notes or bp.allocation):
                 st.info("No budget details provided in the strategy.")
 
         # Trends & adaptation
         with st.expander("Trends & adaptation", expanded=False):
-            tr = strategy.get("trend_adaptation", {})
-            desc = safe_text(tr.get("strategy") or tr.get("description"))
-            sources = as_list(tr.get("trend_sources"))
+            tr = strategy.trend_adaptation
 
-            if desc:
-                st.write(desc)
-            if sources:
+            if tr.strategy:
+                st.write(tr.strategy)
+            if tr.trend_sources:
                 st.markdown("**Sources**")
-                for s in sources:
+                for s in tr.trend_sources:
                     st.markdown(f"- {s}")
 
-            if not desc and not sources:
+            if not tr.strategy and not tr.trend_sources:
                 st.info("No trends & adaptation details provided in the strategy.")
 
         # Analytics & feedback
         with st.expander("Analytics & feedback", expanded=False):
-            af = strategy.get("analytics_feedback", {})
-
-            if isinstance(af, str):
-                text = safe_text(af)
-                if text:
-                    st.write(text)
-                else:
-                    st.info("No analytics details provided in the strategy.")
-            else:
-                desc = safe_text(af.get("description") or af.get("summary"))
-                kpis = as_list(af.get("kpis") or af.get("metrics"))
-                loops = as_list(af.get("feedback_loops") or af.get("processes"))
-                tools = as_list(af.get("tools"))
-
-                has_content = False
-
-                if desc:
-                    has_content = True
-                    st.markdown("**Description**")
-                    st.write(desc)
-
-                if kpis:
-                    has_content = True
-                    st.markdown("**Kpis**")
-                    for k in kpis:
-                        st.markdown(f"- {k}")
-
-                if loops:
-                    has_content = True
-                    st.markdown("**Feedback loops**")
-                    for l in loops:
-                        st.markdown(f"- {l}")
-
-                if tools:
-                    has_content = True
-                    st.markdown("**Tools**")
-                    for t in tools:
-                        st.markdown(f"- {t}")
-
-                if not has_content:
-                    st.info("No analytics details provided in the strategy.")
-
-    # ----- Execution calendar -----
+            af = strategy.analytics_feedback
+
+            if af.description:
+                st.markdown("**Description**")
+                st.write(af.description)
+
+            if af.kpis:
+                st.markdown("**Kpis**")
+                for k in af.kpis:
+                    st.markdown(f"- {k}")
+
+            if af.feedback_loops:
+                st.markdown("**Feedback loops**")
+                for l in af.feedback_loops:
+                    st.markdown(f"- {l}")
+
+            if af.tools:
+                st.markdown("**Tools**")
+                for t in af.tools:
+                    st.markdown(f"- {t}")
+
+            if not (af.description or af.kpis or af.feedback_loops or af.tools):
+                st.info("No analytics details provided in the strategy.")
+
+
+def render_calendar(calendar):
     st.markdown("### 📅 Calendar (ready-to-implement schedule)")
     if calendar:
-        cal_df = pd.DataFrame(calendar)
+        cal_df = pd.DataFrame([asdict(e) for e in calendar])
         cal_df.index = cal_df.index + 1  # start index at 1
         cols = [
             c
@@ -443,14 +284,15 @@ if submitted:
     else:
         st.info("No calendar entries generated.")
 
-    # ----- Campaigns & Posts side by side -----
+
+def render_assets(campaigns, posts):
     st.markdown("### Campaign assets")
     c1, c2 = st.columns(2, gap="large")
 
     with c1:
         st.subheader("🎯 Campaigns")
         if campaigns:
-            camp_df = pd.DataFrame(campaigns)
+            camp_df = pd.DataFrame([c.model_dump() for c in campaigns])
             camp_df.index = camp_df.index + 1  # start index at 1
             st.dataframe(camp_df, width="stretch", height=260)
         else:
@@ -459,7 +301,7 @@ if submitted:
     with c2:
         st.subheader("✍️ Posts (top-ranked)")
         if posts:
-            posts_df = pd.DataFrame(posts)
+            posts_df = pd.DataFrame([asdict(p) for p in posts])
             posts_df.index = posts_df.index + 1  # start index at 1
             cols = [
                 c
@@ -470,11 +312,188 @@ if submitted:
         else:
             st.info("No posts generated yet.")
 
-    # ----- Experiments -----
+
+def render_experiments(experiments):
     st.markdown("### 🧪 Experiments & Testing Plan")
     if experiments:
-        exp_df = pd.DataFrame(experiments)
+        exp_df = pd.DataFrame([e.model_dump() for e in experiments])
         exp_df.index = exp_df.index + 1  # start index at 1
         st.dataframe(exp_df, width="stretch", height=220)
     else:
         st.info("No experiments defined yet.")
+
+
+def render_timing(trace):
+    totals = trace.get("totals", {})
+    with st.expander("⏱️ Timing & usage", expanded=False):
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Wall time", f"{totals.get('wall_ms', 0) / 1000:.1f}s")
+        m2.metric("LLM calls", int(totals.get("llm_calls", 0)))
+        m3.metric(
+            "Tokens (in / out)",
+            f"{int(totals.get('prompt_tokens', 0))} / {int(totals.get('completion_tokens', 0))}",
+        )
+        m4.metric("Cache hits", int(totals.get("cache_hits", 0)))
+
+        spans = trace.get("spans", [])
+        if spans:
+            span_df = pd.DataFrame(spans)
+            cols = [
+                c
+                for c in [
+                    "name", "kind", "start_ms", "duration_ms", "prompt_tokens",
+                    "completion_tokens", "parse_ms", "cache_hit", "retries", "throttle_ms",
+                    "hedged", "hedge_won",
+                ]
+                if c in span_df.columns
+            ]
+            st.dataframe(span_df[cols], width="stretch", height=260)
+
+
+RESULT_SECTIONS = ("strategy", "calendar", "assets", "experiments", "timing")
+
+
+def render_result(plan: CampaignPlan, slots):
+    """Render a finished run into the given st.empty() slots."""
+    with slots["strategy"].container():
+        render_strategy(plan.strategy)
+    with slots["calendar"].container():
+        render_calendar(plan.calendar)
+        if plan.unscheduled:
+            st.caption(
+                f"{len(plan.unscheduled)} lower-ranked posts didn't fit the "
+                "timeline and channel cadence, so they were left off the calendar."
+            )
+    with slots["assets"].container():
+        render_assets(plan.campaigns, plan.posts)
+    with slots["experiments"].container():
+        render_experiments(plan.experiments)
+    with slots["timing"].container():
+        render_timing(plan.trace)
+        st.download_button(
+            "Download plan (JSON)",
+            plan.model_dump_json(indent=2),
+            file_name="cmp_plan.json",
+            mime="application/json",
+            key="cmp_download",
+        )
+
+
+def stream_run(brief, slots):
+    """Run the pipeline, filling the slots as stages finish; return the validated plan."""
+    loop, llm, search_tool = get_runtime()
+    progress = st.status("Thinking, validating, and planning your campaign...")
+    plan = None
+    strategy = {}
+
+    events = iter_campaign_events(brief, llm=llm, search_tool=search_tool, loop=loop, memo=get_stage_memo())
+    for event in events:
+        if event["type"] == "stage_started":
+            label = STAGE_LABELS.get(event["stage"], event["stage"])
+            progress.update(label=f"{label}...")
+        elif event["type"] == "stage_finished":
+            stage, data = event["stage"], event["data"]
+            suffix = " (unchanged, reused)" if event.get("memoized") else ""
+            progress.write(f"✅ {STAGE_LABELS.get(stage, stage)}{suffix}")
+            # planner gives the first strategy; researcher revises market & trends and adds validation notes
+            if stage in ("planner", "researcher"):
+                strategy = {**strategy, **data}
+                with slots["strategy"].container():
+                    render_strategy(Strategy.model_validate(strategy))
+            elif stage == "writer":
+                with slots["assets"].container():
+                    render_assets(
+                        campaigns_adapter.validate_python(data.get("campaigns")),
+                        posts_adapter.validate_python(data.get("posts")),
+                    )
+        elif event["type"] == "result":
+            plan = CampaignPlan.from_result(event["data"])
+
+    progress.update(label="Your CMP plan is ready", state="complete", expanded=False)
+    return plan
+
+
+# ---------- Brief form ----------
+with st.form("cmp_brief_form"):
+    col1, col2 = st.columns(2)
+
+    with col1:
+        topic = st.text_input("Campaign topic", "AI tools for small businesses")
+        product = st.text_input("Product / offer", "AI automation SaaS for SMEs")
+        target_audience = st.text_area(
+            "Target audience (who are we talking to?)",
+            "Owners of small service businesses in US/Europe.",
+            height=80,
+        )
+        preferred_channels = st.text_input(
+            "Preferred channels",
+            "LinkedIn, email, blog, YouTube shorts",
+        )
+
+    with col2:
+        goals_kpis = st.text_area(
+            "Goals & KPIs",
+            "Increase trials by 30% in 3 months; KPIs: trials, demo bookings, CTR.",
+            height=80,
+        )
+        budget = st.text_input(
+            "Budget & resources",
+            "Low to medium budget; mostly organic content and small paid tests.",
+        )
+        timeline_weeks = st.number_input(
+            "Timeline (weeks)", min_value=2, max_value=12, value=6, step=1
+        )
+        constraints = st.text_area(
+            "Constraints / must-nots",
+            "No misleading claims; avoid heavy technical jargon; limited design team.",
+            height=80,
+        )
+
+    additional_notes = st.text_area(
+        "Additional notes (optional)",
+        "",
+        height=60,
+    )
+
+    submitted = st.form_submit_button("Generate CMP Plan ")
+
+
+
+
+# ---------- Run CMP ----------
+# Streamlit re-executes this script on every interaction, so the last run is
+# kept in session_state, and finished runs are cached by brief hash: widget
+# changes, downloads and resubmitting an unchanged brief never re-run the LLMs.
+if submitted:
+    brief = {
+        "topic": topic,
+        "product": product,
+        "target_audience": target_audience,
+        "goals_kpis": goals_kpis,
+        "budget": budget,
+        "preferred_channels": preferred_channels,
+        "timeline_weeks": int(timeline_weeks),
+        "constraints": constraints,
+        "additional_notes": additional_notes,
+    }
+    # The calendar is scheduled from today, so a plan is only reused on the day it was made
+    key = f"{brief_hash(brief)}:{date.today().isoformat()}"
+    results = get_result_cache()
+
+    render_brief(brief)
+    slots = {name: st.empty() for name in RESULT_SECTIONS}
+    plan = results.get(key)
+    if plan is None:
+        # Each section renders as soon as the stage that produces it finishes,
+        # while the remaining stages keep running in the background.
+        plan = stream_run(brief, slots)
+        results.set(key, plan)
+    else:
+        st.caption("Same brief as an earlier run today: showing the saved plan.")
+    st.session_state["cmp_run"] = {"brief": brief, "plan": plan}
+    render_result(plan, slots)
+
+elif "cmp_run" in st.session_state:
+    run = st.session_state["cmp_run"]
+    render_brief(run["brief"])
+    render_result(run["plan"], {name: st.empty() for name in RESULT_SECTIONS})